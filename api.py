@@ -0,0 +1,289 @@
+import hmac
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, Response, abort, current_app, request
+from werkzeug.exceptions import HTTPException
+from models.venue import Venue
+from models.artist import Artist
+from conditional import conditional
+from extensions import cache, replicas
+from forms import GENRES
+import geo
+import repository
+import summaries
+import writes
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+  import json
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# Reads go through the same repository functions as the HTML views. Every
+# endpoint accepts ?fields= to select the columns it returns; listings page
+# with ?cursor= and ?limit= and return the next cursor alongside the data,
+# and filter with ?genre=, ?state=, ?city= and ?upcoming=1; shows also take
+# ?from= and ?to= bounds on start_time.
+# /venues/near finds the venues around a point or inside a box, nearest first;
+# /shows/conflicts lists the double bookings between ?from= and ?to=.
+# Writes are batch upserts through writes.py, for clients holding the
+# API_WRITE_TOKEN bearer token.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+SHOW_LIST_FIELDS = {'upcoming_shows', 'past_shows'}
+SHOW_COUNT_FIELDS = {'upcoming_shows_count', 'past_shows_count'}
+SHOWS_FIELDS = SHOW_LIST_FIELDS | SHOW_COUNT_FIELDS
+
+def _default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError
+
+def dumps(payload):
+  if orjson is not None:
+    return orjson.dumps(payload, default=_default)
+  return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+def to_json(payload, status=200):
+  return Response(dumps(payload), status=status, mimetype='application/json')
+
+def parse_fields(value, allowed, default):
+  if not value:
+    return list(default)
+  fields = [field.strip() for field in value.split(',') if field.strip()]
+  unknown = [field for field in fields if field not in allowed]
+  if unknown:
+    abort(400, 'Unknown fields: ' + ', '.join(unknown))
+  return fields
+
+def parse_limit(value, config):
+  try:
+    limit = int(value)
+  except (TypeError, ValueError):
+    limit = config['API_PAGE_SIZE']
+  return max(1, min(limit, config['API_MAX_PAGE_SIZE']))
+
+def parse_filters(args):
+  """Read the listing filters from a query string mapping."""
+  genre = args.get('genre')
+  if genre:
+    if genre.lower() not in GENRES:
+      abort(400, 'Unknown genre: ' + genre)
+    genre = GENRES[genre.lower()]
+  return {
+    'genre': genre or None,
+    'state': args.get('state') or None,
+    'city': args.get('city') or None,
+    'upcoming': args.get('upcoming', '').lower() in ('1', 'true', 'yes')
+  }
+
+def _number(value, name, low, high):
+  if value is None:
+    abort(400, 'Missing parameter: ' + name)
+  try:
+    value = float(value)
+  except ValueError:
+    abort(400, 'Not a number: ' + name)
+  if not low <= value <= high:
+    abort(400, '%s must be between %g and %g' % (name, low, high))
+  return value
+
+def parse_area(args, config):
+  """Read ?lat=&lng=&radius= (kilometres) or ?bbox=west,south,east,north.
+
+  Returns (latitude, longitude, box, radius_km); a box is searched whole and
+  sorted by the distance from its centre.
+  """
+  if args.get('bbox'):
+    try:
+      west, south, east, north = [float(value) for value in args['bbox'].split(',')]
+    except ValueError:
+      abort(400, 'bbox must be west,south,east,north')
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+      abort(400, 'bbox must be west,south,east,north')
+    return (south + north) / 2, (west + east) / 2, (south, west, north, east), None
+  latitude = _number(args.get('lat'), 'lat', -90, 90)
+  longitude = _number(args.get('lng'), 'lng', -180, 180)
+  radius_km = _number(args.get('radius', config['API_NEAR_RADIUS_KM']), 'radius', 0, config['API_MAX_NEAR_RADIUS_KM'])
+  return latitude, longitude, geo.bounding_box(latitude, longitude, radius_km), radius_km
+
+def parse_time(value, name):
+  try:
+    value = datetime.fromisoformat(value[:-1] if value.endswith('Z') else value)
+  except ValueError:
+    abort(400, name + ' must be an ISO 8601 date or time')
+  # start times are stored as naive UTC
+  if value.tzinfo is not None:
+    value = value.astimezone(timezone.utc).replace(tzinfo=None)
+  return value
+
+def parse_range(args):
+  """Read the optional ?from= and ?to= bounds on start_time."""
+  start = parse_time(args['from'], 'from') if args.get('from') else None
+  end = parse_time(args['to'], 'to') if args.get('to') else None
+  if start and end and end <= start:
+    abort(400, 'to must be after from')
+  return {'start': start, 'end': end}
+
+def parse_window(args, config):
+  """Read ?from= and ?to=; from defaults to now and to to API_CONFLICT_WINDOW_DAYS later."""
+  start = parse_time(args['from'], 'from') if args.get('from') else datetime.now()
+  end = parse_time(args['to'], 'to') if args.get('to') else start + timedelta(days=config['API_CONFLICT_WINDOW_DAYS'])
+  if not start < end <= start + timedelta(days=config['API_MAX_CONFLICT_WINDOW_DAYS']):
+    abort(400, 'to must be after from and at most %d days later' % config['API_MAX_CONFLICT_WINDOW_DAYS'])
+  return start, end
+
+def _columns(model):
+  return [column.name for column in model.__table__.columns]
+
+def show_fields(value):
+  return parse_fields(value, repository.SHOW_FIELDS, ['id'] + list(repository.PAGE_SHOW_FIELDS))
+
+def listing_fields(model, value):
+  return parse_fields(value, _columns(model), ['id', 'name'])
+
+def detail_fields(model, value):
+  """Return the requested fields and, of those, the model's own columns."""
+  columns = _columns(model)
+  fields = parse_fields(value, columns + sorted(SHOWS_FIELDS), columns)
+  return fields, [field for field in fields if field in columns]
+
+def add_shows(data, fields, upcoming_shows, past_shows):
+  shows_data = {
+    'upcoming_shows': upcoming_shows,
+    'past_shows': past_shows,
+    'upcoming_shows_count': len(upcoming_shows),
+    'past_shows_count': len(past_shows)
+  }
+  data.update((field, shows_data[field]) for field in fields if field in SHOWS_FIELDS)
+  return data
+
+def _listing(model):
+  fields = listing_fields(model, request.args.get('fields'))
+  data, next_cursor = repository.list_entities(model, fields,
+    cursor=request.args.get('cursor'),
+    limit=parse_limit(request.args.get('limit'), current_app.config),
+    filters=repository.listing_filters(model, **parse_filters(request.args)))
+  return to_json({'data': data, 'next_cursor': next_cursor})
+
+def add_counts(data, fields, upcoming_count, past_count):
+  counts = {'upcoming_shows_count': upcoming_count, 'past_shows_count': past_count}
+  data.update((field, counts[field]) for field in fields if field in SHOW_COUNT_FIELDS)
+
+def _detail(model, entity_id, shows):
+  fields, columns = detail_fields(model, request.args.get('fields'))
+  data = repository.get_entity(model, entity_id, columns)
+  # the show history is only queried when the lists were asked for; counts
+  # alone come from the show summaries
+  if SHOW_LIST_FIELDS.intersection(fields):
+    add_shows(data, fields, *shows(entity_id))
+  elif SHOW_COUNT_FIELDS.intersection(fields):
+    add_counts(data, fields, *summaries.show_counts(model, entity_id))
+  return to_json(data)
+
+# registered by code too, or the app-wide HTML handlers for 404/500 take precedence
+@api.errorhandler(400)
+@api.errorhandler(404)
+@api.errorhandler(HTTPException)
+def api_error(error):
+  return to_json({'error': error.name, 'message': error.description}, status=error.code)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@replicas.reads
+@conditional(repository.venues_freshness)
+def venues():
+  return _listing(Venue)
+
+# not conditional: the next shows change as time passes, not only on writes
+@api.route('/venues/near')
+@replicas.reads
+def venues_near():
+  latitude, longitude, box, radius_km = parse_area(request.args, current_app.config)
+  data = repository.venues_near(latitude, longitude, box, radius_km,
+    limit=parse_limit(request.args.get('limit'), current_app.config),
+    filters=repository.listing_filters(Venue, **parse_filters(request.args)))
+  return to_json({'data': data})
+
+@api.route('/venues/<int:venue_id>')
+@replicas.reads
+@conditional(repository.venue_freshness)
+def venue(venue_id):
+  return _detail(Venue, venue_id, repository.venue_shows)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@replicas.reads
+@conditional(repository.artists_freshness)
+def artists():
+  return _listing(Artist)
+
+@api.route('/artists/<int:artist_id>')
+@replicas.reads
+@conditional(repository.artist_freshness)
+def artist(artist_id):
+  return _detail(Artist, artist_id, repository.artist_shows)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@replicas.reads
+@conditional(repository.shows_freshness)
+def shows():
+  fields = show_fields(request.args.get('fields'))
+  data, next_cursor = repository.list_shows(cursor=request.args.get('cursor'),
+    limit=parse_limit(request.args.get('limit'), current_app.config), fields=fields,
+    filters=repository.show_filters(**parse_filters(request.args), **parse_range(request.args)))
+  return to_json({'data': data, 'next_cursor': next_cursor})
+
+@api.route('/shows/conflicts')
+@replicas.reads
+def show_conflicts():
+  start, end = parse_window(request.args, current_app.config)
+  return to_json({'data': repository.list_conflicts(start, end)})
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@api.route('/genres')
+@replicas.reads
+def genres():
+  # counts are as of the last `flask roll-summaries`
+  columns = ['genre', 'venue_count', 'artist_count', 'upcoming_venue_count', 'upcoming_artist_count', 'upcoming_show_count']
+  return to_json({'data': [{column: getattr(facet, column) for column in columns} for facet in summaries.genre_facets()]})
+
+#  Batch upsert
+#  ----------------------------------------------------------------
+
+@api.route('/<any(venues, artists, shows):entity>/batch', methods=['POST'])
+def batch(entity):
+  token = current_app.config.get('API_WRITE_TOKEN')
+  if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+    abort(401)
+  payload = request.get_json(silent=True)
+  rows = payload.get('data') if isinstance(payload, dict) else payload
+  if not isinstance(rows, list):
+    abort(400, 'Expected a JSON array of rows, or an object with a "data" array.')
+  if len(rows) > current_app.config['API_MAX_BATCH_SIZE']:
+    abort(413, 'At most %d rows per batch.' % current_app.config['API_MAX_BATCH_SIZE'])
+  # the batch is applied whole or not at all
+  try:
+    prepared = writes.prepare(entity, rows)
+  except writes.BatchError as e:
+    return to_json({
+      'error': 'Bad Request',
+      'message': str(e),
+      'rows': [{'index': index, 'errors': errors} for index, errors in e.errors]
+    }, status=400)
+  ids, groups = writes.upsert(entity, prepared)
+  cache.invalidate(*groups)
+  return to_json({'data': [{'id': entity_id} for entity_id in ids]})
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import re
+import time
+from urllib.parse import parse_qsl
+from itsdangerous import BadSignature
+from sqlalchemy.exc import DBAPIError
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.http import http_date, parse_cookie, parse_date, parse_etags, quote_etag
+
+# ASGI entry point: `uvicorn asgi:application`. The JSON API reads are served
+# by async handlers; every other request goes to the Flask app through
+# asgiref's WSGI adapter.
+os.environ.setdefault('FYYUR_DEBUG', '0')
+
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+from async_repository import AsyncReplicaSet
+from conditional import compute_etag, not_modified
+from models.venue import Venue
+from models.artist import Artist
+import api
+import async_repository
+import repository
+
+#----------------------------------------------------------------------------#
+# Handlers.
+#----------------------------------------------------------------------------#
+
+def _listing(model):
+  async def handler(engine, config, params):
+    fields = api.listing_fields(model, params.get('fields'))
+    data, next_cursor = await async_repository.list_entities(engine, model, fields,
+      cursor=params.get('cursor'), limit=api.parse_limit(params.get('limit'), config),
+      filters=repository.listing_filters(model, **api.parse_filters(params)))
+    return {'data': data, 'next_cursor': next_cursor}
+  return handler
+
+def _detail(model):
+  async def handler(engine, config, params, entity_id):
+    fields, columns = api.detail_fields(model, params.get('fields'))
+    entity_id = int(entity_id)
+    with_shows = bool(api.SHOW_LIST_FIELDS.intersection(fields))
+    detail = async_repository.get_detail(engine, model, entity_id, columns, with_shows)
+    # as in the Flask API, counts alone come from the show summaries
+    if not with_shows and api.SHOW_COUNT_FIELDS.intersection(fields):
+      (data, shows), counts = await asyncio.gather(detail, async_repository.show_counts(engine, model, entity_id))
+    else:
+      (data, shows), counts = await detail, None
+    if data is None:
+      raise NotFound()
+    if shows is not None:
+      api.add_shows(data, fields, *shows)
+    elif counts is not None:
+      api.add_counts(data, fields, *counts)
+    return data
+  return handler
+
+async def shows(engine, config, params):
+  data, next_cursor = await async_repository.list_shows(engine,
+    cursor=params.get('cursor'), limit=api.parse_limit(params.get('limit'), config),
+    fields=api.show_fields(params.get('fields')),
+    filters=repository.show_filters(**api.parse_filters(params), **api.parse_range(params)))
+  return {'data': data, 'next_cursor': next_cursor}
+
+# pattern, handler, and the freshness function of the Flask route
+ROUTES = [
+  (re.compile(r'/api/v1/venues$'), _listing(Venue), repository.venues_freshness),
+  (re.compile(r'/api/v1/venues/(\d+)$'), _detail(Venue), repository.venue_freshness),
+  (re.compile(r'/api/v1/artists$'), _listing(Artist), repository.artists_freshness),
+  (re.compile(r'/api/v1/artists/(\d+)$'), _detail(Artist), repository.artist_freshness),
+  (re.compile(r'/api/v1/shows$'), shows, repository.shows_freshness),
+]
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+class AsyncReads(object):
+  def __init__(self, app):
+    self.app = app
+    self.wsgi = WsgiToAsgi(app)
+    self.engine = None
+    self.replicas = AsyncReplicaSet(app, app.config['SQLALCHEMY_REPLICA_URIS'])
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self._lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+      for pattern, handler, freshness in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+          return await self._respond(scope, send, handler, freshness, match.groups())
+    return await self.wsgi(scope, receive, send)
+
+  async def _lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        if self.engine is not None:
+          await self.engine.dispose()
+        await self.replicas.close()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  def _primary_until(self, headers):
+    # routing.Replicas keeps the user on the primary for a while after a
+    # write, in the signed Flask session
+    value = parse_cookie(headers.get(b'cookie', b'').decode('latin-1')).get(self.app.config['SESSION_COOKIE_NAME'])
+    serializer = self.app.session_interface.get_signing_serializer(self.app)
+    if not value or serializer is None:
+      return 0
+    try:
+      session = serializer.loads(value, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+      return 0
+    return session.get('db_primary_until', 0)
+
+  async def _respond(self, scope, send, handler, freshness, args):
+    # the engines are created inside the running event loop
+    if self.engine is None:
+      self.engine = async_repository.create_engine(self.app)
+    headers = dict(scope['headers'])
+    replica = self.replicas.choose() if self._primary_until(headers) <= time.time() else None
+    try:
+      status, payload, conditional_headers = await self._read(replica or self.engine, headers, scope, handler, freshness, args)
+    except DBAPIError:
+      # the replica could not be reached: it is now marked down, so read
+      # from the primary
+      if replica is None or self.replicas.down_until.get(replica.url, 0) <= time.monotonic():
+        raise
+      status, payload, conditional_headers = await self._read(self.engine, headers, scope, handler, freshness, args)
+    body = b'' if status == 304 else api.dumps(payload)
+    response_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    response_headers.extend(conditional_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+  async def _read(self, engine, headers, scope, handler, freshness, args):
+    # the ETag, Last-Modified and 304s of @conditional on the Flask routes
+    state = await async_repository.freshness(engine, freshness, *[int(arg) for arg in args])
+    conditional_headers = []
+    if state is not None:
+      parts, last_modified = state
+      etag = compute_etag(parts)
+      conditional_headers.append((b'etag', quote_etag(etag, weak=True).encode()))
+      if last_modified:
+        conditional_headers.append((b'last-modified', http_date(last_modified).encode()))
+      conditional_headers.append((b'cache-control', b'no-cache'))
+      if not_modified(etag, last_modified, parse_etags(headers.get(b'if-none-match', b'').decode('latin-1') or None),
+                      parse_date(headers.get(b'if-modified-since', b'').decode('latin-1') or None)):
+        return 304, None, conditional_headers
+    params = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+    try:
+      return 200, await handler(engine, self.app.config, params, *args), conditional_headers
+    except HTTPException as e:
+      return e.code, {'error': e.name, 'message': e.description}, []
+
+
+application = AsyncReads(create_app())
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import event, select
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+import repository
+import routing
+import summaries
+
+#----------------------------------------------------------------------------#
+# Async reads for the JSON API.
+#
+# The listings run the statements built by repository.py on SQLAlchemy's
+# asyncio engine (asyncpg on PostgreSQL, aiosqlite on SQLite). A detail read
+# is split into independent queries (the entity, its shows, and the
+# counterparts those shows name), each on its own pooled connection, and
+# awaited together. The freshness queries of the Flask routes run here too,
+# and replicas are picked and skipped as routing.py does.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = {
+  'postgresql': 'postgresql+asyncpg',
+  'sqlite': 'sqlite+aiosqlite',
+}
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+def create_engine(app, uri=None):
+  """An async engine for the app's database (or the one at uri), with its pool settings."""
+  from extensions import db
+  config = app.config
+  # the driver hacks make SQLite paths absolute, as for the sync engine
+  sa_url, options = db.apply_driver_hacks(app, make_url(uri or config['SQLALCHEMY_DATABASE_URI']), {})
+  backend = sa_url.get_backend_name()
+  if backend == 'postgresql':
+    options = {key: value for key, value in config['SQLALCHEMY_ENGINE_OPTIONS'].items() if key in POOL_OPTIONS}
+    options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DATABASE_STATEMENT_TIMEOUT'])}}
+  return create_async_engine(sa_url.set(drivername=ASYNC_DRIVERS[backend]), **options)
+
+async def _rows(engine, statement):
+  async with engine.connect() as connection:
+    result = await connection.execute(statement)
+    return result.all()
+
+
+class AsyncReplicaSet(routing.ReplicaSet):
+  """The replicas as async engines, chosen and skipped as routing.ReplicaSet does."""
+
+  def _load(self):
+    self.engines = [create_engine(self.app, uri) for uri in self.uris]
+    self._cycle = itertools.cycle(self.engines)
+    for engine in self.engines:
+      event.listen(engine.sync_engine, 'handle_error', self._handle_error)
+
+  async def close(self):
+    for engine in self.engines or ():
+      await engine.dispose()
+
+#----------------------------------------------------------------------------#
+# Freshness.
+#----------------------------------------------------------------------------#
+
+async def freshness(engine, function, *args):
+  """Run a repository freshness function (one built with repository.freshness) on engine."""
+  statements, state = function.build(*args)
+  async def first(statement):
+    async with engine.connect() as connection:
+      result = await connection.execute(statement)
+      return result.first()
+  return state(await asyncio.gather(*[first(statement) for statement in statements]))
+
+#----------------------------------------------------------------------------#
+# Detail.
+#----------------------------------------------------------------------------#
+
+ShowRow = namedtuple('ShowRow', ['id', 'name', 'image_link', 'start_time'])
+
+# model -> (its key on show, the counterpart model, the counterpart key, prefix)
+COUNTERPARTS = {
+  Venue: (Show.venue_id, Artist, Show.artist_id, 'artist'),
+  Artist: (Show.artist_id, Venue, Show.venue_id, 'venue'),
+}
+
+async def get_entity(engine, model, entity_id, fields):
+  rows = await _rows(engine, select(model.id, *[getattr(model, field) for field in fields]).where(model.id == entity_id))
+  return dict(zip(fields, rows[0][1:])) if rows else None
+
+async def get_detail(engine, model, entity_id, fields, with_shows):
+  """Return (data, (upcoming_shows, past_shows)); data is None when missing."""
+  if not with_shows:
+    return await get_entity(engine, model, entity_id, fields), None
+  key, counterpart, counterpart_key, prefix = COUNTERPARTS[model]
+  now = datetime.now()
+  # split at now like repository.venue_shows: upcoming shows only touch the
+  # recent partitions, past shows every older one
+  shows = select(Show.start_time, counterpart_key) \
+    .where(key == entity_id) \
+    .order_by(Show.start_time, Show.id)
+  counterparts = select(counterpart.id, counterpart.name, counterpart.image_link) \
+    .where(counterpart.id.in_(select(counterpart_key).where(key == entity_id)))
+  data, past_rows, upcoming_rows, counterpart_rows = await asyncio.gather(
+    get_entity(engine, model, entity_id, fields),
+    _rows(engine, shows.where(Show.start_time < now)),
+    _rows(engine, shows.where(Show.start_time >= now)),
+    _rows(engine, counterparts))
+  if data is None:
+    return None, None
+  # the queries see separate snapshots: a show added in between may name a
+  # counterpart that was not fetched, and is left out
+  by_id = {row.id: row for row in counterpart_rows}
+  rows = [ShowRow(by_id[counterpart_id].id, by_id[counterpart_id].name, by_id[counterpart_id].image_link, start_time)
+    for start_time, counterpart_id in past_rows + upcoming_rows if counterpart_id in by_id]
+  return data, repository.split_shows(rows, prefix, now)
+
+async def show_counts(engine, model, entity_id):
+  """Return (upcoming_count, past_count) from the show summaries, as summaries.show_counts."""
+  summary, key, show_key = summaries.SUMMARIES[model]
+  rows = await _rows(engine, select(summary.upcoming_count, summary.past_count).where(key == entity_id))
+  return tuple(rows[0]) if rows else (0, 0)
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+async def list_entities(engine, model, fields, cursor=None, limit=20, filters=()):
+  rows = await _rows(engine, repository.entities_page_statement(model, fields, cursor, limit, filters))
+  return repository.entities_page(rows, limit, fields)
+
+async def list_shows(engine, cursor=None, limit=100, fields=repository.PAGE_SHOW_FIELDS, filters=()):
+  rows = await _rows(engine, repository.shows_page_statement(cursor, limit, fields, filters))
+  return repository.shows_page(rows, limit, fields)
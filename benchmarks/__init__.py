@@ -0,0 +1,22 @@
+"""Benchmarks, load scenarios and a synthetic data generator for Fyyur.
+
+The database is taken from BENCH_DATABASE_URL and defaults to a SQLite file
+next to this package, so everything runs without a PostgreSQL server.
+"""
+import os
+
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.db')
+
+
+def database_url():
+  return os.environ.get('BENCH_DATABASE_URL', DEFAULT_DATABASE_URL)
+
+
+def create_bench_app(url=None, cache=False):
+  """Return a Fyyur app pointed at the benchmark database."""
+  from app import create_app
+  return create_app({
+    'SQLALCHEMY_DATABASE_URI': url or database_url(),
+    'WTF_CSRF_ENABLED': False,
+    'CACHE_TYPE': 'simple' if cache else 'null',
+  })
@@ -0,0 +1,52 @@
+"""Compare the template datetime filter with the dateutil-based one it replaced.
+
+    python benchmarks/bench_format_datetime.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+import filters
+
+
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(tiles=3000, distinct=300, repeat=5):
+  # a /shows page: many tiles, with show times repeating across tiles
+  start = datetime(2026, 1, 1, 20, 0)
+  values = [(start + timedelta(days=i % distinct)).isoformat(timespec='milliseconds') + 'Z' for i in range(tiles)]
+  for value in values[:distinct]:
+    assert filters.format_datetime(value, 'full') == legacy_format_datetime(value, 'full'), value
+
+  def render(fn):
+    for value in values:
+      fn(value, 'full')
+
+  def cold():
+    filters.format_datetime.cache_clear()
+    render(filters.format_datetime)
+
+  results = [
+    ('legacy (dateutil + babel)', min(timeit.repeat(lambda: render(legacy_format_datetime), number=1, repeat=repeat))),
+    ('filters, cold output cache', min(timeit.repeat(cold, number=1, repeat=repeat))),
+    ('filters, warm output cache', min(timeit.repeat(lambda: render(filters.format_datetime), number=1, repeat=repeat))),
+  ]
+  print('%d values, %d distinct, best of %d' % (tiles, distinct, repeat))
+  for name, seconds in results:
+    print('%-28s %8.2f ms  %6.2f us/value' % (name, seconds * 1000, seconds / tiles * 1e6))
+
+
+if __name__ == '__main__':
+  main()
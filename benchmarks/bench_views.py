@@ -0,0 +1,69 @@
+"""pytest-benchmark micro-benchmarks, one per view.
+
+    python -m pytest benchmarks --benchmark-json=bench.json
+"""
+from benchmarks.conftest import VENUES, ARTISTS
+
+# the most popular venue/artist under the Zipf skew has the most shows
+BUSY_VENUE = 1
+BUSY_ARTIST = 1
+
+
+def bench_index(get):
+  get('/')
+
+
+def bench_venues(get):
+  get('/venues')
+
+
+def bench_venues_page_2(get):
+  get('/venues?page=2')
+
+
+def bench_show_venue_busy(get):
+  get('/venues/%d' % BUSY_VENUE)
+
+
+def bench_show_venue_quiet(get):
+  get('/venues/%d' % VENUES)
+
+
+def bench_search_venues(get):
+  get('/venues/search', method='POST', data={'search_term': 'Hall'})
+
+
+def bench_artists(get):
+  get('/artists')
+
+
+def bench_show_artist_busy(get):
+  get('/artists/%d' % BUSY_ARTIST)
+
+
+def bench_show_artist_quiet(get):
+  get('/artists/%d' % ARTISTS)
+
+
+def bench_search_artists(get):
+  get('/artists/search', method='POST', data={'search_term': 'Band'})
+
+
+def bench_shows(get):
+  get('/shows')
+
+
+def bench_api_venues(get):
+  get('/api/v1/venues?fields=id,name,city&limit=100')
+
+
+def bench_api_shows(get):
+  get('/api/v1/shows?limit=100')
+
+
+def bench_create_venue_form(get):
+  get('/venues/create')
+
+
+def bench_edit_venue_form(get):
+  get('/venues/%d/edit' % BUSY_VENUE)
@@ -0,0 +1,42 @@
+"""Diff two load reports written by benchmarks/load.py.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+
+
+def _change(before, after):
+  if before is None or after is None:
+    return '%10s %10s %8s' % (before, after, '')
+  delta = (after - before) / before * 100 if before else 0.0
+  return '%10s %10s %+7.1f%%' % (before, after, delta)
+
+
+def compare(before, after):
+  lines = ['%s -> %s' % (before.get('commit'), after.get('commit'))]
+  sections = [('total', before['total'], after['total'])]
+  sections += [(name, before['routes'].get(name, {}), route) for name, route in sorted(after['routes'].items())]
+  for name, old, new in sections:
+    lines.append(name)
+    for metric in METRICS:
+      lines.append('  %-20s %s' % (metric, _change(old.get(metric), new.get(metric))))
+  return '\n'.join(lines)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('before')
+  parser.add_argument('after')
+  args = parser.parse_args()
+  with open(args.before) as f:
+    before = json.load(f)
+  with open(args.after) as f:
+    after = json.load(f)
+  print(compare(before, after))
+
+
+if __name__ == '__main__':
+  main()
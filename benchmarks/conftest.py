@@ -0,0 +1,39 @@
+import os
+import pytest
+from benchmarks import create_bench_app
+
+# catalog size for the view benchmarks; override through the environment
+VENUES = int(os.environ.get('BENCH_VENUES', 200))
+ARTISTS = int(os.environ.get('BENCH_ARTISTS', 1000))
+SHOWS = int(os.environ.get('BENCH_SHOWS', 20000))
+
+
+@pytest.fixture(scope='session')
+def app():
+  from benchmarks.datagen import seed_database
+  app = create_bench_app()
+  with app.app_context():
+    seed_database(VENUES, ARTISTS, SHOWS)
+  return app
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def get(client, benchmark):
+  """Benchmark a GET and record the queries it ran (from Server-Timing)."""
+  def run(url, method='GET', data=None):
+    def request():
+      response = client.open(url, method=method, data=data)
+      body = response.get_data()
+      assert response.status_code == 200, (url, response.status_code)
+      return response, body
+    response, body = benchmark(request)
+    timing = response.headers.get('Server-Timing', '')
+    benchmark.extra_info['queries'] = int(timing.split('desc="')[1].split()[0]) if 'desc="' in timing else None
+    benchmark.extra_info['bytes'] = len(body)
+    return response
+  return run
@@ -0,0 +1,161 @@
+"""Seeded synthetic catalog: N venues, M artists and K shows.
+
+Popularity is Zipf-skewed, so a few venues and artists own most of the
+shows and a few cities hold most of the venues, as in real listings.
+
+    python -m benchmarks.datagen --venues 1000 --artists 5000 --shows 200000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+  ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+  ('Dallas', 'TX'), ('San Jose', 'CA'), ('Austin', 'TX'), ('Jacksonville', 'FL'),
+  ('San Francisco', 'CA'), ('Columbus', 'OH'), ('Seattle', 'WA'), ('Denver', 'CO'),
+  ('Washington', 'DC'), ('Boston', 'MA'), ('Nashville', 'TN'), ('Detroit', 'MI'),
+  ('Portland', 'OR'), ('Las Vegas', 'NV'), ('Memphis', 'TN'), ('Louisville', 'KY'),
+  ('Baltimore', 'MD'), ('Milwaukee', 'WI'), ('Albuquerque', 'NM'), ('Atlanta', 'GA'),
+  ('Miami', 'FL'), ('New Orleans', 'LA'),
+]
+
+NAME_PARTS = ['Blue', 'Red', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Neon', 'Crimson', 'Wild']
+VENUE_KINDS = ['Hall', 'Lounge', 'Club', 'Theatre', 'Room', 'Garden', 'Arena', 'Bar']
+ARTIST_KINDS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project', 'Ensemble']
+
+
+def zipf_weights(n, s):
+  return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _genres(rng, genres):
+  return rng.sample(genres, rng.randint(1, 3))
+
+
+def generate_rows(venues, artists, shows, seed=0, skew=1.1, now=None):
+  """Yield (entity, row) pairs; shows reference venue and artist ids 1..N."""
+  from forms import GENRE_CHOICES
+  rng = random.Random(seed)
+  genres = [value for value, label in GENRE_CHOICES]
+  now = now or datetime.now().replace(microsecond=0)
+  city_weights = zipf_weights(len(CITIES), skew)
+
+  for i in range(1, venues + 1):
+    city, state = rng.choices(CITIES, weights=city_weights)[0]
+    yield 'venues', {
+      'name': '%s %s %d' % (rng.choice(NAME_PARTS), rng.choice(VENUE_KINDS), i),
+      'city': city,
+      'state': state,
+      'address': '%d Main Street' % rng.randint(1, 9999),
+      'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+      'genres': _genres(rng, genres),
+      'image_link': 'https://images.example.com/venues/%d.jpg' % i,
+      'facebook_link': 'https://www.facebook.com/venue%d' % i,
+      'website': 'https://venue%d.example.com' % i,
+      'seeking_talent': rng.random() < 0.3,
+      'seeking_description': None,
+    }
+
+  for i in range(1, artists + 1):
+    city, state = rng.choices(CITIES, weights=city_weights)[0]
+    yield 'artists', {
+      'name': 'The %s %s %d' % (rng.choice(NAME_PARTS), rng.choice(ARTIST_KINDS), i),
+      'city': city,
+      'state': state,
+      'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+      'genres': _genres(rng, genres),
+      'image_link': 'https://images.example.com/artists/%d.jpg' % i,
+      'facebook_link': 'https://www.facebook.com/artist%d' % i,
+      'website': None,
+      'seeking_venue': rng.random() < 0.3,
+      'seeking_description': None,
+    }
+
+  # cumulative weights make each draw O(log n)
+  venue_ids = list(range(1, venues + 1))
+  artist_ids = list(range(1, artists + 1))
+  venue_cum = _cumulative(zipf_weights(venues, skew))
+  artist_cum = _cumulative(zipf_weights(artists, skew))
+  for i in range(shows):
+    venue_id = rng.choices(venue_ids, cum_weights=venue_cum)[0]
+    artist_id = rng.choices(artist_ids, cum_weights=artist_cum)[0]
+    # two years of history, one year ahead, on the hour
+    start_time = now.replace(minute=0, second=0) + timedelta(hours=rng.randint(-2 * 365 * 24, 365 * 24))
+    yield 'shows', {
+      'venue_id': venue_id,
+      'artist_id': artist_id,
+      'start_time': start_time,
+      'end_time': start_time + timedelta(hours=2),
+    }
+
+
+def _cumulative(weights):
+  total = 0.0
+  cumulative = []
+  for weight in weights:
+    total += weight
+    cumulative.append(total)
+  return cumulative
+
+
+def seed_database(venues, artists, shows, seed=0, skew=1.1, chunk_size=5000, reset=True):
+  """Create the schema in the current app's database and load a synthetic catalog."""
+  from extensions import db
+  import importer
+  from models.show import Show
+  from models.venue import Venue
+  from models.artist import Artist
+  models = {'venues': Venue, 'artists': Artist, 'shows': Show}
+  if reset:
+    db.drop_all()
+  db.create_all()
+
+  chunk, entity = [], None
+  for kind, row in generate_rows(venues, artists, shows, seed=seed, skew=skew):
+    if kind != entity or len(chunk) >= chunk_size:
+      if chunk:
+        importer.write_rows(models[entity], chunk)
+        db.session.commit()
+      chunk, entity = [], kind
+    chunk.append(row)
+  if chunk:
+    importer.write_rows(models[entity], chunk)
+    db.session.commit()
+
+  import summaries
+  summaries.rebuild()
+  db.session.commit()
+
+  if db.engine.dialect.name == 'sqlite':
+    import search
+    with db.engine.begin() as connection:
+      search.create_sqlite_fts(connection)
+    db.session.execute(db.text('ANALYZE'))
+  elif db.engine.dialect.name == 'postgresql':
+    db.session.execute(db.text('ANALYZE'))
+  db.session.commit()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--venues', type=int, default=500)
+  parser.add_argument('--artists', type=int, default=2000)
+  parser.add_argument('--shows', type=int, default=50000)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of venue, artist and city popularity.')
+  parser.add_argument('--database-url', help='Defaults to BENCH_DATABASE_URL or a local SQLite file.')
+  args = parser.parse_args()
+
+  from benchmarks import create_bench_app
+  app = create_bench_app(args.database_url)
+  started = time.perf_counter()
+  with app.app_context():
+    seed_database(args.venues, args.artists, args.shows, seed=args.seed, skew=args.skew)
+  print('Seeded %d venues, %d artists, %d shows in %.1fs' % (
+    args.venues, args.artists, args.shows, time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,172 @@
+"""Closed-loop load scenario over the main routes, wrk/locust style.
+
+Runs CONCURRENCY workers for DURATION seconds against a running server
+(--url) or in-process through the Flask test client, then writes a JSON
+report with per-route p50/p95/p99 latency, throughput and queries per
+request (read from the Server-Timing header) that compare.py can diff.
+
+    python -m benchmarks.load --url http://127.0.0.1:5000 --duration 30 -o report.json
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+# (name, weight, method, path, form); {venue}/{artist} are filled per request
+SCENARIO = [
+  ('venues', 15, 'GET', '/venues', None),
+  ('shows', 15, 'GET', '/shows', None),
+  ('show_venue', 20, 'GET', '/venues/{venue}', None),
+  ('show_artist', 20, 'GET', '/artists/{artist}', None),
+  ('artists', 10, 'GET', '/artists', None),
+  ('search_venues', 10, 'POST', '/venues/search', {'search_term': 'Hall'}),
+  ('search_artists', 10, 'POST', '/artists/search', {'search_term': 'Band'}),
+]
+
+
+def percentile(sorted_values, fraction):
+  if not sorted_values:
+    return None
+  index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+  return sorted_values[index]
+
+
+def _queries(server_timing):
+  if server_timing and 'desc="' in server_timing:
+    return int(server_timing.split('desc="')[1].split()[0])
+  return None
+
+
+class HttpTarget(object):
+  def __init__(self, base_url):
+    self.base_url = base_url.rstrip('/')
+
+  def request(self, method, path, form):
+    data = urllib.parse.urlencode(form).encode() if form else None
+    req = urllib.request.Request(self.base_url + path, data=data, method=method)
+    try:
+      with urllib.request.urlopen(req) as response:
+        response.read()
+        return response.status, response.headers.get('Server-Timing')
+    except urllib.error.HTTPError as e:
+      return e.code, e.headers.get('Server-Timing')
+
+
+class AppTarget(object):
+  def __init__(self, app):
+    self.app = app
+
+  def request(self, method, path, form):
+    response = self.app.test_client().open(path, method=method, data=form)
+    response.get_data()
+    return response.status_code, response.headers.get('Server-Timing')
+
+
+def run(target, duration=10.0, concurrency=4, venues=200, artists=1000, seed=0):
+  names = [step[0] for step in SCENARIO]
+  weights = [step[1] for step in SCENARIO]
+  steps = {step[0]: step for step in SCENARIO}
+  samples = defaultdict(list)
+  queries = defaultdict(list)
+  errors = defaultdict(int)
+  lock = threading.Lock()
+  deadline = time.perf_counter() + duration
+
+  def worker(worker_id):
+    rng = random.Random(seed + worker_id)
+    while time.perf_counter() < deadline:
+      name = rng.choices(names, weights=weights)[0]
+      _, _, method, path, form = steps[name]
+      # detail pages skew towards popular entities, like the seeded data
+      path = path.format(venue=min(venues, int(rng.paretovariate(1.1))), artist=min(artists, int(rng.paretovariate(1.1))))
+      started = time.perf_counter()
+      status, server_timing = target.request(method, path, form)
+      elapsed = time.perf_counter() - started
+      with lock:
+        if status >= 400:
+          errors[name] += 1
+        else:
+          samples[name].append(elapsed)
+          count = _queries(server_timing)
+          if count is not None:
+            queries[name].append(count)
+
+  threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  wall = time.perf_counter() - started
+  return report(samples, queries, errors, wall, concurrency)
+
+
+def _summary(latencies, query_counts, error_count, wall):
+  latencies = sorted(latencies)
+  return {
+    'requests': len(latencies),
+    'errors': error_count,
+    'rps': round(len(latencies) / wall, 2),
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+    'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+  }
+
+
+def _commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def report(samples, queries, errors, wall, concurrency):
+  routes = {}
+  for name, weight, method, path, form in SCENARIO:
+    routes[name] = _summary(samples[name], queries[name], errors[name], wall)
+  everything = [value for values in samples.values() for value in values]
+  every_query = [value for values in queries.values() for value in values]
+  return {
+    'commit': _commit(),
+    'python': platform.python_version(),
+    'concurrency': concurrency,
+    'duration_s': round(wall, 2),
+    'total': _summary(everything, every_query, sum(errors.values()), wall),
+    'routes': routes,
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--url', help='Base URL of a running server; the app runs in-process when omitted.')
+  parser.add_argument('--duration', type=float, default=10.0)
+  parser.add_argument('--concurrency', type=int, default=4)
+  parser.add_argument('--venues', type=int, default=200, help='Highest venue id to request.')
+  parser.add_argument('--artists', type=int, default=1000, help='Highest artist id to request.')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--output', '-o', help='Write the JSON report here instead of standard output.')
+  args = parser.parse_args()
+
+  if args.url:
+    target = HttpTarget(args.url)
+  else:
+    from benchmarks import create_bench_app
+    target = AppTarget(create_bench_app())
+  result = run(target, args.duration, args.concurrency, args.venues, args.artists, args.seed)
+  output = json.dumps(result, indent=2, sort_keys=True)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(output + '\n')
+  else:
+    print(output)
+
+
+if __name__ == '__main__':
+  main()
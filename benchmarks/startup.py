@@ -0,0 +1,70 @@
+"""Worker startup benchmark: cold import, app creation and first request.
+
+Each run is a fresh interpreter, so every module is imported cold. The child
+times `import app`, `create_app()` and the first and second GET of PATH; the
+parent reports the median and worst of each phase as JSON.
+
+    python -m benchmarks.startup --runs 10 --path /venues
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from benchmarks import create_bench_app
+application = create_bench_app()
+created = time.perf_counter()
+client = application.test_client()
+timings = []
+for _ in range(2):
+  before = time.perf_counter()
+  response = client.get(sys.argv[1])
+  response.get_data()
+  timings.append(time.perf_counter() - before)
+print(json.dumps({
+  'status': response.status_code,
+  'modules': len(sys.modules),
+  'import_ms': (imported - started) * 1000,
+  'create_app_ms': (created - imported) * 1000,
+  'first_request_ms': timings[0] * 1000,
+  'second_request_ms': timings[1] * 1000,
+}))
+'''
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms')
+
+
+def run_once(path):
+  env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+  output = subprocess.check_output([sys.executable, '-c', CHILD, path], cwd=ROOT, env=env)
+  return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def measure(runs=5, path='/venues'):
+  samples = [run_once(path) for _ in range(runs)]
+  result = {'path': path, 'runs': runs, 'modules': samples[-1]['modules'], 'status': samples[-1]['status']}
+  for phase in PHASES:
+    values = [sample[phase] for sample in samples]
+    result[phase] = {'median': round(statistics.median(values), 2), 'max': round(max(values), 2)}
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=5)
+  parser.add_argument('--path', default='/venues')
+  args = parser.parse_args()
+  print(json.dumps(measure(args.runs, args.path), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,203 @@
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import Response, g, make_response, request, session
+from routing import read_primary
+
+#----------------------------------------------------------------------------#
+# Backends.
+#
+# A backend only needs get/set/delete. Values are bytes or str; ttl is in
+# seconds, with None meaning no expiry.
+#----------------------------------------------------------------------------#
+
+class NullCache(object):
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl=None):
+    pass
+
+  def delete(self, key):
+    pass
+
+
+class LRUCache(object):
+  def __init__(self, max_entries=1024):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      expires_at, value = entry
+      if expires_at is not None and expires_at <= time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    expires_at = time.monotonic() + ttl if ttl else None
+    with self._lock:
+      self._entries[key] = (expires_at, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def delete(self, key):
+    with self._lock:
+      self._entries.pop(key, None)
+
+  def __len__(self):
+    return len(self._entries)
+
+
+class RedisCache(object):
+  # `client` is anything with redis-py's get/set/delete signatures, so a local
+  # stand-in such as fakeredis can replace a real server
+  def __init__(self, client, prefix='fyyur:'):
+    self.client = client
+    self.prefix = prefix
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    import redis
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def get(self, key):
+    return self.client.get(self.prefix + key)
+
+  def set(self, key, value, ttl=None):
+    self.client.set(self.prefix + key, value, ex=ttl or None)
+
+  def delete(self, key):
+    self.client.delete(self.prefix + key)
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Cached pages are tagged with groups such as 'venues' or 'artist:7'. Every
+# group has a version token stored in the backend, and the cache key of a
+# page embeds the tokens of its groups, so invalidating a group replaces its
+# token and every page variant tagged with it (any ?page= or ?cursor=) stops
+# being reachable. A token that was evicted is replaced by a fresh one, which
+# can only cause misses, never stale hits. Pages of @conditional views are
+# keyed by their ETag as well, so a change the tokens missed (made by
+# another process, with a process-local backend) still leads to a miss.
+#----------------------------------------------------------------------------#
+
+class ResponseCache(object):
+  def __init__(self, app=None, backend=None):
+    self.backend = backend
+    self._configured_backend = backend is not None
+    self.default_ttl = None
+    self.hits = Counter()
+    self.misses = Counter()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.default_ttl = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+    # without an explicit backend, each app initialised gets the configured one
+    if not self._configured_backend:
+      cache_type = app.config.get('CACHE_TYPE', 'simple')
+      if cache_type == 'simple':
+        self.backend = LRUCache(app.config.get('CACHE_MAX_ENTRIES', 1024))
+      elif cache_type == 'redis':
+        self.backend = RedisCache.from_url(app.config['CACHE_REDIS_URL'])
+      elif cache_type == 'null':
+        self.backend = NullCache()
+      else:
+        raise ValueError('Unknown CACHE_TYPE ' + repr(cache_type))
+    app.extensions['response_cache'] = self
+
+  @property
+  def process_local(self):
+    """Whether the backend lives in this process, out of reach of the others' invalidations."""
+    return isinstance(self.backend, LRUCache)
+
+  def disable(self):
+    self.backend = NullCache()
+
+  def _version(self, group):
+    key = 'version:' + group
+    version = self.backend.get(key)
+    if version is None:
+      version = uuid.uuid4().hex
+      self.backend.set(key, version)
+    return version.decode() if isinstance(version, bytes) else version
+
+  def invalidate(self, *groups):
+    for group in groups:
+      self.backend.set('version:' + group, uuid.uuid4().hex)
+
+  def versions(self, groups):
+    return [self._version(group) for group in groups]
+
+  def _key(self, groups):
+    return 'view:' + ':'.join(self.versions(groups)) + ':' + g.get('etag', '') + ':' + request.full_path
+
+  def cached(self, groups, ttl=None):
+    """Cache the HTML of a GET view under the groups returned by groups(**view_args)."""
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # pages rendered with pending flash messages are per-user
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+          return view(*args, **kwargs)
+        key = self._key(groups(**kwargs))
+        body = self.backend.get(key)
+        if body is not None:
+          self.hits[request.endpoint] += 1
+          response = Response(body, mimetype='text/html')
+          response.headers['X-Cache'] = 'HIT'
+          return response
+        self.misses[request.endpoint] += 1
+        # a page keyed by its ETag can be rendered on the replica the ETag
+        # was read from: the body is at least as new as its key, and a
+        # lagging replica only delays the page by its lag. Other pages are
+        # served to everyone after an invalidation whose write a replica
+        # may not have yet, so they are read from the primary.
+        if not g.get('etag'):
+          read_primary()
+        response = self._store(key, make_response(view(*args, **kwargs)), ttl or self.default_ttl)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+      return wrapper
+    return decorator
+
+  def _store(self, key, response, ttl):
+    if response.status_code != 200:
+      return response
+    if not response.is_streamed:
+      self.backend.set(key, response.get_data(), ttl)
+      return response
+    # keep streaming to the client and store the page once it is complete
+    chunks = response.response
+    def tee():
+      body = []
+      for chunk in chunks:
+        body.append(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        yield chunk
+      self.backend.set(key, b''.join(body), ttl)
+    response.response = tee()
+    return response
+
+  def stats(self):
+    hits = sum(self.hits.values())
+    misses = sum(self.misses.values())
+    return {
+      "hits": hits,
+      "misses": misses,
+      "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+      "endpoints": {
+        endpoint: {"hits": self.hits[endpoint], "misses": self.misses[endpoint]}
+        for endpoint in set(self.hits) | set(self.misses)
+      }
+    }
@@ -0,0 +1,95 @@
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+
+#----------------------------------------------------------------------------#
+# iCalendar feeds of venue and artist schedules.
+#
+# A feed is one VEVENT per show, read in start_time order from the
+# (venue_id, start_time) or (artist_id, start_time) index, optionally
+# bounded to [start, end), through a server-side cursor. Events are encoded
+# and yielded in batches as the rows arrive, so a feed of any length is
+# streamed in bounded memory. Each event's UID is stable per show and its
+# DTSTAMP is the show's updated_at, so clients update events in place.
+#----------------------------------------------------------------------------#
+
+MIMETYPE = 'text/calendar'
+
+# model -> its key on show
+KEYS = {
+  Venue: Show.venue_id,
+  Artist: Show.artist_id,
+}
+
+def _text(value):
+  # TEXT values escape backslashes, semicolons, commas and newlines
+  return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def _time(value):
+  # start times are UTC, as in the JSON API
+  return value.strftime('%Y%m%dT%H%M%SZ')
+
+def _fold(line):
+  # content lines are at most 75 octets; longer ones continue on lines
+  # starting with a space
+  data = line.encode('utf-8')
+  if len(data) <= 75:
+    return data + b'\r\n'
+  parts, start = [], 0
+  while start < len(data):
+    end = min(start + (75 if not parts else 74), len(data))
+    # never split a UTF-8 sequence
+    while end < len(data) and data[end] & 0xC0 == 0x80:
+      end -= 1
+    parts.append(data[start:end])
+    start = end
+  return b'\r\n '.join(parts) + b'\r\n'
+
+def shows(model, entity_id, start=None, end=None, batch_size=500):
+  """The shows of a venue or an artist in start_time order, with the names of both sides."""
+  key = KEYS[model]
+  query = db.session.query(
+      Show.id, Show.start_time, Show.end_time, Show.updated_at,
+      Artist.name.label('artist_name'), Venue.name.label('venue_name'),
+      Venue.address, Venue.city, Venue.state) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .filter(key == entity_id)
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  return query.order_by(Show.start_time, Show.id).yield_per(batch_size)
+
+def _event(show, domain):
+  location = ', '.join(part for part in (show.venue_name, show.address, show.city, show.state) if part)
+  return b''.join(_fold(line) for line in (
+    'BEGIN:VEVENT',
+    'UID:show-%d@%s' % (show.id, domain),
+    'DTSTAMP:' + _time(show.updated_at),
+    'DTSTART:' + _time(show.start_time),
+    'DTEND:' + _time(show.end_time),
+    'SUMMARY:' + _text(show.artist_name + ' at ' + show.venue_name),
+    'LOCATION:' + _text(location),
+    'END:VEVENT',
+  ))
+
+def ics_chunks(name, rows, domain, batch_size=500):
+  """Yield the encoded calendar named name, batch_size events at a time."""
+  yield b''.join(_fold(line) for line in (
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//Fyyur//Schedules//EN',
+    'CALSCALE:GREGORIAN',
+    'METHOD:PUBLISH',
+    'X-WR-CALNAME:' + _text(name),
+  ))
+  batch = []
+  for row in rows:
+    batch.append(_event(row, domain))
+    if len(batch) == batch_size:
+      yield b''.join(batch)
+      batch = []
+  batch.append(_fold('END:VCALENDAR'))
+  yield b''.join(batch)
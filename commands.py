@@ -0,0 +1,174 @@
+import os
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db, cache
+from models.venue import Venue
+from models.artist import Artist
+import search
+import explain
+import importer
+import exporter
+import geocoding
+import partitions
+import summaries
+
+#----------------------------------------------------------------------------#
+# CLI commands.
+#----------------------------------------------------------------------------#
+
+def _invalidate(*groups):
+  """Invalidate response cache groups from a command, when the web processes can see it."""
+  # a per-process cache (CACHE_TYPE=simple) is out of this process's reach;
+  # the web processes still re-render the pages whose ETag changed
+  if cache.process_local:
+    if not _invalidate.warned:
+      click.echo('CACHE_TYPE=simple is per process: cached pages are not invalidated from here. '
+        'Set CACHE_TYPE=redis to share the cache with the web processes.', err=True)
+      _invalidate.warned = True
+    return
+  cache.invalidate(*groups)
+
+_invalidate.warned = False
+
+@click.command('search-index')
+@with_appcontext
+def search_index():
+  """Create and rebuild the SQLite FTS5 search tables."""
+  if db.engine.dialect.name != 'sqlite':
+    raise click.ClickException('Search indexes for ' + db.engine.dialect.name + ' are managed by migrations.')
+  with db.engine.begin() as connection:
+    search.create_sqlite_fts(connection)
+  click.echo('Search index rebuilt.')
+
+@click.command('check-indexes')
+@with_appcontext
+def check_indexes():
+  """EXPLAIN the hot queries and fail if any of them scans a whole table."""
+  if None in explain.sample_ids().values():
+    raise click.ClickException('The check needs at least one venue and one artist in the database.')
+  failures = explain.check_hot_paths()
+  for view, statement, tables in failures:
+    click.echo(view + ': full scan of ' + ', '.join(tables), err=True)
+    click.echo('  ' + ' '.join(statement.split()), err=True)
+  if failures:
+    raise click.ClickException(str(len(failures)) + ' hot queries do not use an index.')
+  click.echo('All hot queries use index scans.')
+
+@click.command('import')
+@click.argument('entity', type=click.Choice(sorted(importer.ENTITIES)))
+@click.argument('path', type=click.File('rb'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+  help='File format; guessed from the file extension when omitted.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and written per transaction.')
+@with_appcontext
+def import_file(entity, path, format, chunk_size):
+  """Bulk import venues, artists or shows from a CSV or NDJSON file, gzipped or not.
+
+  Shows may reference venues and artists by venue_id/artist_id or by
+  venue_name/artist_name.
+  """
+  name = getattr(path, 'name', '')
+  name = name[:-3] if name.endswith('.gz') else name
+  format = format or ('ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv')
+  report = importer.import_rows(entity, importer.read_rows(importer.open_text(path), format), chunk_size=chunk_size)
+  for line, errors in sorted(report.rejected)[:20]:
+    click.echo('line ' + str(line) + ': ' + '; '.join(errors), err=True)
+  if len(report.rejected) > 20:
+    click.echo('... ' + str(len(report.rejected) - 20) + ' more rejected rows', err=True)
+  _invalidate(*report.groups)
+  click.echo('Imported {} {}, rejected {} in {:.2f}s ({:.0f} rows/s).'.format(
+    report.imported, entity, len(report.rejected), report.elapsed, report.rows_per_second))
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(sorted(exporter.ENTITIES)))
+@click.option('--format', 'format', type=click.Choice(sorted(exporter.FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Output file; standard output by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched from the server-side cursor at a time.')
+@with_appcontext
+def export_entity(entity, format, output, batch_size):
+  """Stream every venue, artist or show to CSV, NDJSON or Parquet."""
+  for chunk in exporter.export(entity, format, batch_size=batch_size):
+    output.write(chunk)
+
+@click.command('roll-summaries')
+@click.option('--interval', type=int, help='Keep running and roll every INTERVAL seconds.')
+@click.option('--rebuild', is_flag=True, help='Recompute every summary from the shows first.')
+@with_appcontext
+def roll_summaries(interval, rebuild):
+  """Move shows that have started from upcoming to past in the show summaries.
+
+  The genre facets are recomputed on every roll.
+  """
+  if rebuild:
+    summaries.rebuild()
+    db.session.commit()
+    _invalidate('venues', 'artists')
+    click.echo('Summaries rebuilt.')
+  while True:
+    rolled = summaries.roll()
+    genres_changed = summaries.refresh_genres()
+    db.session.commit()
+    groups = ['venue:%d' % venue_id for venue_id in rolled[Venue]] + ['artist:%d' % artist_id for artist_id in rolled[Artist]]
+    if groups:
+      _invalidate('venues', 'artists', *groups)
+    if genres_changed:
+      # the listings show the genre facets
+      _invalidate('venues', 'artists', 'shows')
+    click.echo('Rolled {} venues and {} artists.'.format(len(rolled[Venue]), len(rolled[Artist])))
+    if not interval:
+      return
+    time.sleep(interval)
+
+@click.command('partitions')
+@click.option('--ahead', type=int, help='Months of partitions to keep ahead; SHOW_PARTITION_MONTHS_AHEAD by default.')
+@click.option('--retention', type=int, help='Archive months older than this; SHOW_RETENTION_MONTHS by default, 0 to keep all.')
+@click.option('--archive-dir', type=click.Path(file_okay=False), help='Where archives are written; SHOW_ARCHIVE_DIR by default.')
+@click.option('--detach-only', is_flag=True, help='Detach old partitions but keep them as tables instead of archiving.')
+@with_appcontext
+def maintain_partitions(ahead, retention, archive_dir, detach_only):
+  """Create upcoming monthly show partitions and archive old ones.
+
+  Every partition also gets the constraints against overlapping bookings.
+  """
+  if db.engine.dialect.name != 'postgresql':
+    raise click.ClickException('Show partitions need PostgreSQL.')
+  config = current_app.config
+  ahead = config['SHOW_PARTITION_MONTHS_AHEAD'] if ahead is None else ahead
+  retention = config['SHOW_RETENTION_MONTHS'] if retention is None else retention
+  archive_dir = archive_dir or config['SHOW_ARCHIVE_DIR']
+  created = partitions.ensure(ahead)
+  unconstrained = partitions.constrain([partitions.DEFAULT] + sorted(partitions.list_partitions().values()))
+  db.session.commit()
+  click.echo('Created {} partitions{}'.format(len(created), ': ' + ', '.join(created) if created else '.'))
+  for name, constraint in unconstrained:
+    click.echo('{} holds overlapping shows, {} not added; see /api/v1/shows/conflicts.'.format(name, constraint), err=True)
+  if not retention:
+    return
+  os.makedirs(archive_dir, exist_ok=True)
+  before = partitions.add_months(partitions.month_start(datetime.now()), -retention)
+  archived = partitions.archive(before, archive_dir, drop=not detach_only)
+  groups = {'venues', 'artists', 'shows'}
+  for name, path, venue_ids, artist_ids in archived:
+    groups.update('venue:%d' % venue_id for venue_id in venue_ids)
+    groups.update('artist:%d' % artist_id for artist_id in artist_ids)
+    click.echo('Detached ' + name + (', archived to ' + path if path else '.'))
+  if archived:
+    _invalidate(*groups)
+
+@click.command('geocode')
+@click.option('--all', 'everything', is_flag=True, help='Place every venue again, not only those without a position.')
+@with_appcontext
+def geocode(everything):
+  """Fill venue coordinates from the offline geocoder."""
+  placed, unknown = geocoding.fill(everything)
+  db.session.commit()
+  click.echo('Placed {} venues.'.format(placed))
+  for city, state in unknown:
+    click.echo('Unknown place: {}, {}'.format(city, state), err=True)
+
+def init_app(app):
+  for command in (search_index, check_indexes, import_file, export_entity, roll_summaries, maintain_partitions, geocode):
+    app.cli.add_command(command)
@@ -0,0 +1,53 @@
+import hashlib
+from functools import wraps
+from flask import g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# A view decorated with @conditional(freshness) first calls
+# freshness(**view_args), a cheap aggregate query that returns the values
+# the page depends on plus its last modification time. When the client
+# already holds that version the view is not run at all and a 304 is sent.
+# The ETag is left in g.etag for the view: the response cache keys pages by
+# it, so a cached body always matches the ETag it is sent with, even when
+# the change was made by another process that could not invalidate it.
+#----------------------------------------------------------------------------#
+
+def compute_etag(parts):
+  return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def not_modified(etag, last_modified, if_none_match, if_modified_since):
+  """Whether a client holding if_none_match (ETags) or if_modified_since has this version."""
+  if if_none_match:
+    return if_none_match.contains_weak(etag)
+  if if_modified_since and last_modified:
+    # HTTP dates have one second resolution
+    return last_modified.replace(microsecond=0) <= if_modified_since.replace(tzinfo=None)
+  return False
+
+def conditional(freshness):
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # a page carrying flash messages must not be revalidated later
+      if session.get('_flashes'):
+        return view(*args, **kwargs)
+      state = freshness(**kwargs)
+      if state is None:
+        return view(*args, **kwargs)
+      parts, last_modified = state
+      etag = g.etag = compute_etag(parts)
+      if not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+        response = make_response('', 304)
+      else:
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag, weak=True)
+      if last_modified:
+        response.last_modified = last_modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
@@ -1,12 +1,101 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+# Every setting can be overridden from the environment, or from a Python file
+# named by FYYUR_SETTINGS.
+def env_int(name, default):
+  return int(os.environ.get(name, default))
+
+def env_bool(name, default):
+  return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes')
+
+# Set SECRET_KEY in production: a random key differs between workers and
+# restarts, which invalidates sessions and CSRF tokens.
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = env_bool('FYYUR_DEBUG', True)
 
 # Connect to the database
 
-SQLALCHEMY_DATABASE_URI = 'postgresql://zayan@127.0.0.1:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://zayan@127.0.0.1:5432/fyyur')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per process. pool_pre_ping replaces connections dropped by
+# the server or a proxy, pool_recycle retires them before idle timeouts, and
+# the statement timeout (milliseconds, 0 for none) stops a runaway query from
+# holding a connection. Pool sizes and the timeout are ignored on SQLite.
+DATABASE_STATEMENT_TIMEOUT = env_int('DATABASE_STATEMENT_TIMEOUT', 30000)
+SQLALCHEMY_ENGINE_OPTIONS = {
+  'pool_size': env_int('DATABASE_POOL_SIZE', 5),
+  'max_overflow': env_int('DATABASE_MAX_OVERFLOW', 10),
+  'pool_timeout': env_int('DATABASE_POOL_TIMEOUT', 30),
+  'pool_recycle': env_int('DATABASE_POOL_RECYCLE', 1800),
+  'pool_pre_ping': env_bool('DATABASE_POOL_PRE_PING', True),
+  'connect_args': {
+    'options': '-c statement_timeout=%d' % DATABASE_STATEMENT_TIMEOUT
+  },
+}
+
+# Read replicas, as comma-separated URLs in DATABASE_REPLICA_URLS. Read-only
+# views query them round-robin; a replica that fails to connect is skipped
+# for REPLICA_RETRY_SECONDS, and after a write the same user reads from the
+# primary for REPLICA_STICKY_SECONDS.
+SQLALCHEMY_REPLICA_URIS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_STICKY_SECONDS = env_int('REPLICA_STICKY_SECONDS', 10)
+REPLICA_RETRY_SECONDS = env_int('REPLICA_RETRY_SECONDS', 30)
+
+# Listings
+SHOWS_PER_PAGE = 100
+AREAS_PER_PAGE = 50
+SEARCH_RESULTS_LIMIT = 50
+
+# Show partitions (PostgreSQL), maintained by `flask partitions`: monthly
+# partitions are kept SHOW_PARTITION_MONTHS_AHEAD months ahead, and months
+# more than SHOW_RETENTION_MONTHS old (0 keeps everything) are archived to
+# gzipped CSV in SHOW_ARCHIVE_DIR.
+SHOW_PARTITION_MONTHS_AHEAD = env_int('SHOW_PARTITION_MONTHS_AHEAD', 12)
+SHOW_RETENTION_MONTHS = env_int('SHOW_RETENTION_MONTHS', 0)
+SHOW_ARCHIVE_DIR = os.environ.get('SHOW_ARCHIVE_DIR', os.path.join(basedir, 'archive'))
+
+# Geocoding: GEOCODER names a class built with the app config whose
+# locate(city, state, address) returns (latitude, longitude) or None. The
+# default looks cities up in the CSV table GEOCODER_TABLE, offline.
+GEOCODER = os.environ.get('GEOCODER', 'geocoding.TableGeocoder')
+GEOCODER_TABLE = os.environ.get('GEOCODER_TABLE', os.path.join(basedir, 'data', 'us_cities.csv'))
+
+# JSON API
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Bearer token required by the batch upsert endpoints (POST /api/v1/<entity>/batch);
+# they are disabled when unset
+API_WRITE_TOKEN = os.environ.get('API_WRITE_TOKEN')
+API_MAX_BATCH_SIZE = 1000
+# /api/v1/venues/near: the radius used when none is given and the largest
+# accepted, in kilometres
+API_NEAR_RADIUS_KM = 25
+API_MAX_NEAR_RADIUS_KM = 500
+# /api/v1/shows/conflicts: the window used when ?to= is not given and the
+# longest accepted, in days
+API_CONFLICT_WINDOW_DAYS = 30
+API_MAX_CONFLICT_WINDOW_DAYS = 366
+# Number of template fragments buffered before each write of a streamed page
+TEMPLATE_STREAM_BUFFER = 20
+
+# Response cache: 'simple' (in-process LRU), 'redis' or 'null'
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# Bearer token required by /export; the endpoint is disabled when unset
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN')
+
+# SQL profiling: Server-Timing header and a log line per request. A statement
+# shape run this many times in one request is reported as an N+1; in testing
+# mode SQL_PROFILER_RAISE turns N+1s and requests over budget into errors.
+SQL_PROFILER = env_bool('SQL_PROFILER', True)
+SQL_N_PLUS_ONE_THRESHOLD = 5
+SQL_QUERY_BUDGET = None
+SQL_PROFILER_RAISE = False
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, func
+from extensions import db
+from models.venue import Venue
+from models.artist import Artist
+import calendars
+import repository
+
+#----------------------------------------------------------------------------#
+# EXPLAIN checks for the hot queries behind the views.
+#
+# Each hot path is run for real against the configured database while its
+# statements are captured, then every captured statement is EXPLAINed. A
+# statement fails the check when its plan reads a table with a sequential
+# scan, or walks a whole index of a table that the hot path is not expected
+# to read in index order (the /shows page and the distinct venue areas).
+#----------------------------------------------------------------------------#
+
+HOT_PATHS = [
+  ('show_venue', lambda ids: repository.get_venue_detail(ids['venue']), ()),
+  ('show_artist', lambda ids: repository.get_artist_detail(ids['artist']), ()),
+  ('shows', lambda ids: repository.list_shows(limit=current_app.config['SHOWS_PER_PAGE']), ('show',)),
+  ('venues', lambda ids: repository.list_venue_areas(per_page=current_app.config['AREAS_PER_PAGE']), ('venue',)),
+  ('venue_calendar', lambda ids: calendars.shows(Venue, ids['venue'], start=datetime.now()).all(), ()),
+  ('artist_calendar', lambda ids: calendars.shows(Artist, ids['artist'], start=datetime.now()).all(), ()),
+]
+
+def capture_statements(fn, *args):
+  statements = []
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements.append((statement, parameters))
+  event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    fn(*args)
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+  return statements
+
+def _postgresql_full_scans(connection, statement, parameters, ordered_scans):
+  # with sequential scans disabled the planner only picks one when no index
+  # can serve the query at all
+  connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+  result = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+  plan = result if isinstance(result, list) else json.loads(result)
+  scans = []
+  nodes = [plan[0]['Plan']]
+  while nodes:
+    node = nodes.pop()
+    table = node.get('Relation Name')
+    if node['Node Type'] == 'Seq Scan':
+      scans.append(table)
+    elif node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node \
+        and table not in ordered_scans:
+      scans.append(table)
+    nodes.extend(node.get('Plans', []))
+  return scans
+
+def _sqlite_full_scans(connection, statement, parameters, ordered_scans):
+  rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+  scans = []
+  for row in rows:
+    words = row[-1].split()
+    # "SEARCH show USING INDEX ..." seeks; "SCAN show" reads every row, either
+    # from the table or, with "USING INDEX", from an index in order
+    if words[0] != 'SCAN' or words[1] not in db.metadata.tables:
+      continue
+    if 'USING' not in words or words[1] not in ordered_scans:
+      scans.append(words[1])
+  return scans
+
+def full_scans(statement, parameters, ordered_scans=()):
+  dialect = db.engine.dialect.name
+  with db.engine.connect() as connection:
+    transaction = connection.begin()
+    try:
+      if dialect == 'postgresql':
+        return _postgresql_full_scans(connection, statement, parameters, ordered_scans)
+      if dialect == 'sqlite':
+        return _sqlite_full_scans(connection, statement, parameters, ordered_scans)
+      raise NotImplementedError('EXPLAIN checks are not supported on ' + dialect)
+    finally:
+      transaction.rollback()
+
+def sample_ids():
+  return {
+    'venue': db.session.query(func.min(Venue.id)).scalar(),
+    'artist': db.session.query(func.min(Artist.id)).scalar()
+  }
+
+def check_hot_paths():
+  """Return a list of (view, statement, tables) for every full scan found."""
+  ids = sample_ids()
+  failures = []
+  with current_app.test_request_context():
+    for view, fn, ordered_scans in HOT_PATHS:
+      for statement, parameters in capture_statements(fn, ids):
+        tables = full_scans(statement, parameters, ordered_scans)
+        if tables:
+          failures.append((view, statement, tables))
+  return failures
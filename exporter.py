@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+from datetime import datetime
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# Streaming export of the catalog.
+#
+# Rows are read through a server-side cursor (yield_per sets stream_results)
+# and every writer yields encoded chunks as it goes, so memory stays bounded
+# by the batch size whatever the size of the table. CSV output is readable
+# by `flask import`.
+#----------------------------------------------------------------------------#
+
+ENTITIES = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show,
+}
+
+FORMATS = {
+  'csv': 'text/csv',
+  'ndjson': 'application/x-ndjson',
+  'parquet': 'application/vnd.apache.parquet',
+}
+
+def iter_rows(entity, batch_size=1000):
+  model = ENTITIES[entity]
+  query = db.session.query(*model.__table__.columns) \
+    .order_by(model.id) \
+    .yield_per(batch_size)
+  for row in query:
+    yield row
+
+def _isoformat(value):
+  return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def _batches(rows, batch_size):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+def csv_chunks(columns, rows, batch_size=1000):
+  names = [column.name for column in columns]
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow(names)
+  for batch in _batches(rows, batch_size):
+    for row in batch:
+      writer.writerow([','.join(value) if isinstance(value, list) else _isoformat(value) for value in row])
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+  if buffer.tell():
+    yield buffer.getvalue().encode('utf-8')
+
+def ndjson_chunks(columns, rows, batch_size=1000):
+  names = [column.name for column in columns]
+  for batch in _batches(rows, batch_size):
+    if orjson is not None:
+      lines = [orjson.dumps(dict(zip(names, row))) for row in batch]
+    else:
+      lines = [json.dumps(dict(zip(names, row)), default=_isoformat).encode('utf-8') for row in batch]
+    yield b'\n'.join(lines) + b'\n'
+
+class _Sink(object):
+  # a write-only file that hands out what was written since the last drain
+  def __init__(self):
+    self.chunks = []
+    self.closed = False
+
+  def write(self, data):
+    self.chunks.append(bytes(data))
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def close(self):
+    pass
+
+  def drain(self):
+    data = b''.join(self.chunks)
+    self.chunks = []
+    return data
+
+
+def _arrow_type(pyarrow, column):
+  # variants (genres is ARRAY with a JSON variant) report their base type
+  column_type = getattr(column.type, 'impl', column.type)
+  try:
+    python_type = column_type.python_type
+  except NotImplementedError:
+    python_type = None
+  types = {
+    str: pyarrow.string(),
+    int: pyarrow.int64(),
+    float: pyarrow.float64(),
+    bool: pyarrow.bool_(),
+    list: pyarrow.list_(pyarrow.string()),
+    datetime: pyarrow.timestamp('us'),
+  }
+  if python_type not in types:
+    raise TypeError('No Parquet type for column %s (%r)' % (column.name, column.type))
+  return types[python_type]
+
+def parquet_chunks(columns, rows, batch_size=1000):
+  # pyarrow is optional; each batch becomes one row group
+  import pyarrow
+  import pyarrow.parquet
+  names = [column.name for column in columns]
+  schema = pyarrow.schema([(column.name, _arrow_type(pyarrow, column)) for column in columns])
+  sink = _Sink()
+  writer = pyarrow.parquet.ParquetWriter(sink, schema)
+  for batch in _batches(rows, batch_size):
+    writer.write_table(pyarrow.Table.from_pylist([dict(zip(names, row)) for row in batch], schema=schema))
+    yield sink.drain()
+  writer.close()
+  yield sink.drain()
+
+WRITERS = {
+  'csv': csv_chunks,
+  'ndjson': ndjson_chunks,
+  'parquet': parquet_chunks,
+}
+
+def export(entity, format, batch_size=1000):
+  columns = list(ENTITIES[entity].__table__.columns)
+  return WRITERS[format](columns, iter_rows(entity, batch_size), batch_size)
@@ -0,0 +1,19 @@
+from flask_moment import Moment
+from flask_migrate import Migrate
+from cache import ResponseCache
+from profiler import QueryProfiler
+from routing import RoutingSQLAlchemy, Replicas
+
+#----------------------------------------------------------------------------#
+# Extensions.
+#
+# Created unbound so that models and query modules can import them without
+# importing the app; create_app() binds them to an application.
+#----------------------------------------------------------------------------#
+
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+moment = Moment()
+cache = ResponseCache()
+profiler = QueryProfiler()
+replicas = Replicas()
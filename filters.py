@@ -0,0 +1,42 @@
+from datetime import datetime
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Date formatting for templates.
+#
+# Views hand the filter either datetime objects or the ISO strings they built
+# with isoformat(...) + "Z". ISO strings take the datetime.fromisoformat fast
+# path, and only anything else goes through dateutil. Babel locales and
+# compiled patterns are resolved once, and formatted output is memoized,
+# since a page repeats the same few show times many times over.
+#----------------------------------------------------------------------------#
+
+FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def _locale(name):
+  # babel is imported on first use rather than at worker start
+  from babel import Locale
+  return Locale.parse(name)
+
+@lru_cache(maxsize=64)
+def _pattern(format):
+  from babel.dates import parse_pattern
+  return parse_pattern(FORMATS.get(format, format))
+
+def parse_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  try:
+    # fromisoformat only accepts a trailing "Z" from Python 3.11 on
+    return datetime.fromisoformat(value[:-1] if value.endswith('Z') else value)
+  except ValueError:
+    import dateutil.parser
+    return dateutil.parser.parse(value)
+
+@lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale='en'):
+  return _pattern(format).apply(parse_datetime(value), _locale(locale))
@@ -0,0 +1,89 @@
+import hashlib
+from flask import g, has_request_context
+from jinja2 import nodes
+from jinja2.exceptions import TemplateNotFound
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+#----------------------------------------------------------------------------#
+# Template fragment cache.
+#
+#   {% cache key, ttl %}...{% endcache %}
+#
+# key is a cache group such as 'venue-row:3', or a tuple of a group (or a
+# list of groups) followed by values that tell fragments of the same group
+# apart, e.g. ('artist-row:7', show.start_time). As with cached pages, the
+# stored key embeds the version token of each group, so invalidating the
+# group retires every fragment rendered from it, and a page re-rendered
+# after one tile changed reuses all the others. The template name, line and
+# a digest of the template source are part of the key as well, so an edited
+# template never serves old markup. ttl is optional and defaults to the
+# store's default timeout.
+#
+# The store is any object with versions(groups), default_ttl and a backend
+# with get/set, such as the app's ResponseCache. Without one, fragments are
+# rendered every time.
+#----------------------------------------------------------------------------#
+
+class FragmentCacheExtension(Extension):
+  tags = {'cache'}
+
+  def __init__(self, environment):
+    super(FragmentCacheExtension, self).__init__(environment)
+    environment.extend(fragment_cache=None)
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    args = [parser.parse_expression()]
+    if parser.stream.skip_if('comma'):
+      args.append(parser.parse_expression())
+    else:
+      args.append(nodes.Const(None))
+    args.append(nodes.Const(self._fragment_id(parser.name, lineno)))
+    body = parser.parse_statements(['name:endcache'], drop_needle=True)
+    return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+  def _fragment_id(self, name, lineno):
+    try:
+      source = self.environment.loader.get_source(self.environment, name)[0]
+    except (AttributeError, TemplateNotFound, TypeError):
+      source = ''
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    return '%s:%d:%s' % (name, lineno, digest)
+
+  def _render(self, key, ttl, fragment_id, caller):
+    store = self.environment.fragment_cache
+    if store is None:
+      return caller()
+    groups, parts = _split_key(key)
+    cache_key = 'fragment:' + fragment_id + ':' + ':'.join(_versions(store, groups)) + \
+      ''.join(':' + str(part) for part in parts)
+    html = store.backend.get(cache_key)
+    if html is not None:
+      return Markup(html.decode('utf-8') if isinstance(html, bytes) else html)
+    html = caller()
+    store.backend.set(cache_key, str(html), ttl or store.default_ttl)
+    return html
+
+
+def _split_key(key):
+  if isinstance(key, tuple):
+    groups, parts = key[0], key[1:]
+  else:
+    groups, parts = key, ()
+  return ([groups] if isinstance(groups, str) else list(groups)), parts
+
+def _versions(store, groups):
+  # a page asks for the same few groups many times, so tokens are looked up
+  # once per request
+  if not has_request_context():
+    return store.versions(groups)
+  known = g.setdefault('fragment_versions', {})
+  missing = [group for group in groups if group not in known]
+  if missing:
+    known.update(zip(missing, store.versions(missing)))
+  return [known[group] for group in groups]
+
+def init_app(app, store):
+  app.jinja_env.add_extension(FragmentCacheExtension)
+  app.jinja_env.fragment_cache = store
@@ -0,0 +1,88 @@
+import math
+
+#----------------------------------------------------------------------------#
+# Geohashes and distances.
+#
+# A geohash interleaves longitude and latitude bits, five to a base-32
+# character, so every prefix names a cell and the points inside a cell share
+# the prefix. Stored at full precision and indexed, geohashes turn "venues
+# in this box" into a few B-tree range scans: cover the box with cells of
+# one precision, scan each prefix, then check the exact distance.
+#----------------------------------------------------------------------------#
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+# above this many cells a coarser precision is used
+MAX_CELLS = 16
+
+def encode(latitude, longitude, precision=PRECISION):
+  lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+  chars, bits, value, even = [], 0, 0, True
+  while len(chars) < precision:
+    interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+    middle = (interval[0] + interval[1]) / 2
+    value <<= 1
+    if coordinate >= middle:
+      value |= 1
+      interval[0] = middle
+    else:
+      interval[1] = middle
+    even = not even
+    bits += 1
+    if bits == 5:
+      chars.append(BASE32[value])
+      bits, value = 0, 0
+  return ''.join(chars)
+
+def cell_size(precision):
+  """Return (height, width) in degrees of a cell of the given precision."""
+  bits = 5 * precision
+  return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+def bounding_box(latitude, longitude, radius_km):
+  """Return (south, west, north, east) around a point; longitudes are clamped, not wrapped."""
+  lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+  cos_lat = math.cos(math.radians(latitude))
+  lng_delta = 180.0 if cos_lat < 1e-6 else min(180.0, lat_delta / cos_lat)
+  return (max(-90.0, latitude - lat_delta), max(-180.0, longitude - lng_delta),
+    min(90.0, latitude + lat_delta), min(180.0, longitude + lng_delta))
+
+def _cells(box, precision):
+  south, west, north, east = box
+  height, width = cell_size(precision)
+  cells = []
+  lat = math.floor(south / height) * height
+  while lat <= north:
+    lng = math.floor(west / width) * width
+    while lng <= east:
+      # the centre of the cell, kept inside the valid range
+      cells.append(encode(min(lat + height / 2, 90.0), min(lng + width / 2, 180.0), precision))
+      lng += width
+    lat += height
+  return cells
+
+def cover(box):
+  """Return the geohash prefixes of the finest precision that covers box in at most MAX_CELLS cells."""
+  south, west, north, east = box
+  best = ['']
+  for precision in range(1, PRECISION + 1):
+    height, width = cell_size(precision)
+    count = (math.floor(north / height) - math.floor(south / height) + 1) * \
+      (math.floor(east / width) - math.floor(west / width) + 1)
+    if count > MAX_CELLS:
+      break
+    best = _cells(box, precision)
+  return sorted(set(best))
+
+def prefix_range(prefix):
+  """Return the lowest and highest full-precision geohashes starting with prefix."""
+  return prefix.ljust(PRECISION, BASE32[0]), prefix.ljust(PRECISION, BASE32[-1])
+
+def distance_km(lat1, lng1, lat2, lng2):
+  """Great-circle distance (haversine)."""
+  phi1, phi2 = math.radians(lat1), math.radians(lat2)
+  d_phi = phi2 - phi1
+  d_lambda = math.radians(lng2 - lng1)
+  a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+  return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,77 @@
+import csv
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update
+from werkzeug.utils import import_string
+from extensions import db
+from models.venue import Venue
+import geo
+
+#----------------------------------------------------------------------------#
+# Offline geocoding.
+#
+# Venues are placed by a geocoder named by GEOCODER: any class built with
+# the app config whose locate(city, state, address) returns (latitude,
+# longitude) or None. The default looks the city up in GEOCODER_TABLE, a
+# local CSV of city,state,latitude,longitude rows (data/us_cities.csv covers
+# the larger US cities), so no request leaves the machine. A venue is placed
+# at its city's centre; a finer table (postal codes, addresses) can be
+# plugged in the same way.
+#----------------------------------------------------------------------------#
+
+class TableGeocoder(object):
+  def __init__(self, config):
+    self.places = {}
+    with open(config['GEOCODER_TABLE'], newline='', encoding='utf-8') as table:
+      for row in csv.DictReader(table):
+        self.places[self._key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+
+  @staticmethod
+  def _key(city, state):
+    return ' '.join((city or '').lower().split()), (state or '').upper().strip()
+
+  def locate(self, city, state, address=None):
+    return self.places.get(self._key(city, state))
+
+
+def geocoder():
+  """The app's geocoder, built on first use."""
+  extensions = current_app.extensions
+  if 'geocoder' not in extensions:
+    extensions['geocoder'] = import_string(current_app.config['GEOCODER'])(current_app.config)
+  return extensions['geocoder']
+
+def location(latitude, longitude):
+  """The venue columns for a position."""
+  if latitude is None or longitude is None:
+    return {'latitude': None, 'longitude': None, 'geohash': None}
+  return {'latitude': latitude, 'longitude': longitude, 'geohash': geo.encode(latitude, longitude)}
+
+def locate(values):
+  """Add the location columns to a venue's values; given coordinates win over the lookup."""
+  latitude, longitude = values.get('latitude'), values.get('longitude')
+  if latitude is None or longitude is None:
+    latitude, longitude = geocoder().locate(values.get('city'), values.get('state'), values.get('address')) or (None, None)
+  return dict(values, **location(latitude, longitude))
+
+def fill(everything=False):
+  """Geocode the venues that have no position (or all of them), one UPDATE per city.
+
+  Returns the number of venues placed and the (city, state) pairs the
+  geocoder does not know.
+  """
+  table = Venue.__table__
+  unplaced = [] if everything else [table.c.latitude.is_(None)]
+  areas = db.session.execute(select(table.c.city, table.c.state).where(*unplaced).distinct()).all()
+  placed, unknown = 0, []
+  now = datetime.utcnow()
+  for city, state in areas:
+    position = geocoder().locate(city, state)
+    if position is None:
+      unknown.append((city, state))
+      continue
+    result = db.session.execute(update(table)
+      .where(table.c.city == city, table.c.state == state, *unplaced)
+      .values(updated_at=now, **location(*position)))
+    placed += result.rowcount
+  return placed, unknown
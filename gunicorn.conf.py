@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+
+#----------------------------------------------------------------------------#
+# Gunicorn settings, read automatically by `gunicorn wsgi:app` from this
+# directory. Every value can be overridden from the environment.
+#
+# The app is imported once in the master (preload_app) and the workers are
+# forked from it, so the imported code is shared copy-on-write. Database
+# connections must not cross the fork: post_fork disposes of the inherited
+# pool so every worker opens its own.
+#
+# Reloads: `kill -HUP <master>` replaces the workers gracefully but, with
+# preloading, keeps the code the master imported. To deploy new code without
+# dropping requests, send USR2 (starts a new master with the new code), then
+# WINCH and QUIT to the old master once the new workers are up.
+#
+# The response cache must be shared between workers (CACHE_TYPE=redis): a
+# worker only invalidates its own in-process cache, so with more than one
+# worker and CACHE_TYPE=simple the others would keep serving edited pages.
+# post_fork turns the cache off in that case.
+#----------------------------------------------------------------------------#
+
+cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+# requests mostly wait on the database, so each core gets two processes plus
+# one spare, and each process a few threads
+workers = int(os.environ.get('WEB_CONCURRENCY', cpus * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# recycle workers now and then to bound slow memory growth; the jitter keeps
+# them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+# a worker's threads share its pool, so it needs at least one connection per
+# thread; set before the app (and its config) is imported
+os.environ.setdefault('DATABASE_POOL_SIZE', str(threads))
+
+
+def post_fork(server, worker):
+  from extensions import db
+  app = server.app.wsgi()
+  # close=False leaves the parent's connections open for the parent, and
+  # only drops this process's references to them
+  with app.app_context():
+    db.engine.dispose(close=False)
+  app.extensions['replicas'].dispose()
+  cache = app.extensions['response_cache']
+  if server.cfg.workers > 1 and cache.process_local:
+    cache.disable()
+    worker.log.warning('Response cache disabled: CACHE_TYPE=simple is per process and %d workers are running; '
+      'set CACHE_TYPE=redis to share it.', server.cfg.workers)
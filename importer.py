@@ -0,0 +1,401 @@
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from wtforms import SelectMultipleField
+from wtforms.validators import StopValidation, ValidationError
+from extensions import db
+from forms import VenueForm, ArtistForm, ShowForm
+from models.show import Show, DEFAULT_DURATION, MAX_DURATION
+from models.venue import Venue
+from models.artist import Artist
+import geocoding
+import schedule
+import summaries
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows.
+#
+# Files are streamed in chunks; each chunk is validated with the validators
+# declared on the WTForms classes (without instantiating a form per row),
+# written with COPY on PostgreSQL or an executemany INSERT elsewhere, and
+# committed on its own.
+#----------------------------------------------------------------------------#
+
+TRUE_VALUES = ('y', 'yes', 'true', 't', '1')
+
+# ids are 32-bit integer columns
+MAX_ID = 2 ** 31 - 1
+
+# model column -> form field, where the two differ
+FORM_FIELD_NAMES = {'website': 'website_link'}
+
+class _Field(object):
+  # the bits of a bound WTForms field that validators touch
+  def __init__(self, data):
+    self.data = data
+    self.errors = []
+
+  def gettext(self, string):
+    return string
+
+  def ngettext(self, singular, plural, n):
+    return singular if n == 1 else plural
+
+
+def compile_rules(form_class):
+  columns = {field: column for column, field in FORM_FIELD_NAMES.items()}
+  rules = []
+  for name in dir(form_class):
+    unbound = getattr(form_class, name)
+    if not hasattr(unbound, 'field_class'):
+      continue
+    choices = unbound.kwargs.get('choices')
+    rules.append((
+      name,
+      columns.get(name, name),
+      unbound.kwargs.get('validators', []),
+      {value for value, label in choices} if choices else None,
+      issubclass(unbound.field_class, SelectMultipleField)
+    ))
+  return rules
+
+def validate(rules, row):
+  """Return a list of error messages for one row."""
+  errors = []
+  for name, column, validators, choices, multiple in rules:
+    field = _Field(row.get(column))
+    # JSON rows can hold objects and arrays where a form only posts strings
+    if isinstance(field.data, dict) or (isinstance(field.data, list) and not multiple):
+      errors.append(name + ': must be a single value')
+      continue
+    try:
+      for validator in validators:
+        validator(None, field)
+    except StopValidation as e:
+      if e.args and e.args[0]:
+        errors.append(name + ': ' + e.args[0])
+      continue
+    except ValidationError as e:
+      errors.append(name + ': ' + e.args[0])
+      continue
+    if choices is not None and field.data:
+      values = field.data if isinstance(field.data, list) else [field.data]
+      invalid = [value for value in values if value not in choices]
+      if invalid:
+        errors.append(name + ': not a valid choice: ' + ', '.join(str(value) for value in invalid))
+  return errors
+
+#----------------------------------------------------------------------------#
+# Parsing.
+#----------------------------------------------------------------------------#
+
+def _boolean(value):
+  if isinstance(value, bool):
+    return value
+  return str(value or '').strip().lower() in TRUE_VALUES
+
+def _genres(value):
+  if value is None:
+    return []
+  if isinstance(value, list):
+    if not all(isinstance(genre, str) for genre in value):
+      raise ValueError('genres: must be strings')
+    return value
+  if not isinstance(value, str):
+    raise ValueError('genres: must be a list or a comma-separated string')
+  return [genre.strip() for genre in value.split(',') if genre.strip()]
+
+def _naive_utc(value):
+  # start times are stored as naive UTC; an offset is applied, not kept
+  if value.tzinfo is None:
+    return value
+  return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _datetime(value, name):
+  if not value:
+    return value
+  if isinstance(value, datetime):
+    return _naive_utc(value)
+  if not isinstance(value, str):
+    raise ValueError('%s: not an ISO 8601 date and time: %r' % (name, value))
+  value = value.strip()
+  if value.endswith('Z'):
+    value = value[:-1]
+  try:
+    return _naive_utc(datetime.fromisoformat(value))
+  except ValueError:
+    raise ValueError('%s: not an ISO 8601 date and time: %r' % (name, value))
+
+def _optional_int(value, name):
+  if value in (None, ''):
+    return None
+  # JSON rows can hold booleans and fractions where an id is expected
+  if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+    raise ValueError('%s: must be an integer' % name)
+  try:
+    value = int(value)
+  except (TypeError, ValueError, OverflowError):
+    raise ValueError('%s: must be an integer' % name)
+  if not 1 <= value <= MAX_ID:
+    raise ValueError('%s: must be between 1 and %d' % (name, MAX_ID))
+  return value
+
+def _optional_float(value, name, limit):
+  if value in (None, ''):
+    return None
+  value = float(value)
+  if not -limit <= value <= limit:
+    raise ValueError('%s must be between %d and %d' % (name, -limit, limit))
+  return value
+
+def open_text(stream):
+  """Text over a binary file, decompressed when gzipped (as the show archives are)."""
+  if not hasattr(stream, 'peek'):
+    stream = io.BufferedReader(stream)
+  if stream.peek(2)[:2] == b'\x1f\x8b':
+    stream = gzip.GzipFile(fileobj=stream)
+  return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+def read_rows(stream, format):
+  if format == 'csv':
+    for row in csv.DictReader(stream):
+      yield {key: (value if value != '' else None) for key, value in row.items()}
+  elif format == 'ndjson':
+    for line in stream:
+      if line.strip():
+        yield json.loads(line)
+  else:
+    raise ValueError('Unknown format ' + repr(format))
+
+def chunked(rows, size):
+  rows = iter(rows)
+  while True:
+    chunk = list(islice(rows, size))
+    if not chunk:
+      return
+    yield chunk
+
+#----------------------------------------------------------------------------#
+# Writing.
+#----------------------------------------------------------------------------#
+
+def _pg_array(values):
+  items = ('"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"' for value in values)
+  return '{' + ','.join(items) + '}'
+
+def _copy(table, columns, rows):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  for row in rows:
+    values = []
+    for column in columns:
+      value = row[column]
+      if isinstance(value, list):
+        value = _pg_array(value)
+      elif isinstance(value, datetime):
+        value = value.isoformat()
+      values.append(value)
+    writer.writerow(values)
+  buffer.seek(0)
+  cursor = db.session.connection().connection.cursor()
+  cursor.copy_expert(
+    'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(table.name, ', '.join(columns)),
+    buffer)
+
+def write_rows(model, rows):
+  if not rows:
+    return
+  columns = list(rows[0])
+  if db.engine.dialect.name == 'postgresql':
+    now = datetime.utcnow()
+    for row in rows:
+      row['updated_at'] = now
+    _copy(model.__table__, columns + ['updated_at'], rows)
+  else:
+    db.session.execute(model.__table__.insert(), rows)
+
+#----------------------------------------------------------------------------#
+# Entities.
+#----------------------------------------------------------------------------#
+
+VENUE_RULES = compile_rules(VenueForm)
+ARTIST_RULES = compile_rules(ArtistForm)
+SHOW_RULES = compile_rules(ShowForm)
+
+def prepare_venue(row):
+  row = dict(row, genres=_genres(row.get('genres')))
+  errors = validate(VENUE_RULES, row)
+  if errors:
+    return None, errors
+  return geocoding.locate({
+    'id': _optional_int(row.get('id'), 'id'),
+    'name': row['name'],
+    'city': row['city'],
+    'state': row['state'],
+    'address': row['address'],
+    'phone': row.get('phone'),
+    'genres': row['genres'],
+    'facebook_link': row.get('facebook_link'),
+    'image_link': row.get('image_link'),
+    'website': row.get('website'),
+    'seeking_talent': _boolean(row.get('seeking_talent')),
+    'seeking_description': row.get('seeking_description'),
+    # given coordinates are kept, otherwise the geocoder places the venue
+    'latitude': _optional_float(row.get('latitude'), 'latitude', 90),
+    'longitude': _optional_float(row.get('longitude'), 'longitude', 180)
+  }), None
+
+def prepare_artist(row):
+  row = dict(row, genres=_genres(row.get('genres')))
+  errors = validate(ARTIST_RULES, row)
+  if errors:
+    return None, errors
+  return {
+    'id': _optional_int(row.get('id'), 'id'),
+    'name': row['name'],
+    'city': row['city'],
+    'state': row['state'],
+    'phone': row.get('phone'),
+    'genres': row['genres'],
+    'facebook_link': row.get('facebook_link'),
+    'image_link': row.get('image_link'),
+    'website': row.get('website'),
+    'seeking_venue': _boolean(row.get('seeking_venue')),
+    'seeking_description': row.get('seeking_description')
+  }, None
+
+def show_end_time(start_time, end_time):
+  """The end of a show starting at start_time, DEFAULT_DURATION later when not given."""
+  if not end_time:
+    return start_time + DEFAULT_DURATION
+  if not start_time < end_time <= start_time + MAX_DURATION:
+    raise ValueError('end_time: must be after start_time and at most %d hours later' % (MAX_DURATION.total_seconds() // 3600))
+  return end_time
+
+def prepare_show(row):
+  row = dict(row,
+    venue_id=_optional_int(row.get('venue_id'), 'venue_id'),
+    artist_id=_optional_int(row.get('artist_id'), 'artist_id'),
+    start_time=_datetime(row.get('start_time'), 'start_time'),
+    end_time=_datetime(row.get('end_time'), 'end_time'))
+  errors = validate(SHOW_RULES, row)
+  if errors:
+    return None, errors
+  end_time = show_end_time(row['start_time'], row['end_time'])
+  return {
+    'id': _optional_int(row.get('id'), 'id'),
+    'venue_id': row['venue_id'],
+    'venue_name': row.get('venue_name'),
+    'artist_id': row['artist_id'],
+    'artist_name': row.get('artist_name'),
+    'start_time': row['start_time'],
+    'end_time': end_time
+  }, None
+
+def _lookup(model, column, values):
+  # one query per chunk; names that match several rows are ambiguous
+  if not values:
+    return {}
+  found = {}
+  for key, entity_id in db.session.query(column, model.id).filter(column.in_(values)):
+    found[key] = None if key in found else entity_id
+  return found
+
+def resolve_shows(shows):
+  """Resolve the venue/artist references of a chunk of (line, show) pairs in batches."""
+  venue_ids = _lookup(Venue, Venue.id, {s['venue_id'] for line, s in shows if s['venue_id']})
+  artist_ids = _lookup(Artist, Artist.id, {s['artist_id'] for line, s in shows if s['artist_id']})
+  venue_names = _lookup(Venue, Venue.name, {s['venue_name'] for line, s in shows if not s['venue_id'] and s['venue_name']})
+  artist_names = _lookup(Artist, Artist.name, {s['artist_name'] for line, s in shows if not s['artist_id'] and s['artist_name']})
+  resolved, rejected = [], []
+  for line, show in shows:
+    venue_id = venue_ids.get(show['venue_id']) if show['venue_id'] else venue_names.get(show['venue_name'])
+    artist_id = artist_ids.get(show['artist_id']) if show['artist_id'] else artist_names.get(show['artist_name'])
+    if venue_id is None or artist_id is None:
+      rejected.append((line, ['unknown or ambiguous ' + ('venue' if venue_id is None else 'artist')]))
+      continue
+    resolved.append((line, {'id': show['id'], 'venue_id': venue_id, 'artist_id': artist_id,
+      'start_time': show['start_time'], 'end_time': show['end_time']}))
+  return resolved, rejected
+
+def sync_sequence(model):
+  # rows imported with explicit ids do not advance the PostgreSQL sequence
+  if db.engine.dialect.name == 'postgresql':
+    table = model.__tablename__
+    db.session.execute(db.text(
+      "SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), coalesce(max(id), 1)) FROM \"{0}\"".format(table)))
+    db.session.commit()
+
+ENTITIES = {
+  'venues': (Venue, prepare_venue),
+  'artists': (Artist, prepare_artist),
+  'shows': (Show, prepare_show),
+}
+
+class ImportReport(object):
+  def __init__(self):
+    self.imported = 0
+    self.rejected = []
+    # the response cache groups the imported rows touch
+    self.groups = set()
+    self.started = time.perf_counter()
+
+  @property
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  @property
+  def rows_per_second(self):
+    total = self.imported + len(self.rejected)
+    return total / self.elapsed if self.elapsed else 0.0
+
+
+def import_rows(entity, rows, chunk_size=5000):
+  model, prepare = ENTITIES[entity]
+  report = ImportReport()
+  line = 0
+  explicit_ids = False
+  groups = report.groups
+  groups.update({entity, 'venues', 'artists'} if entity == 'shows' else {entity})
+  for chunk in chunked(rows, chunk_size):
+    valid = []
+    for row in chunk:
+      line += 1
+      try:
+        prepared, errors = prepare(row)
+      except (TypeError, ValueError) as e:
+        prepared, errors = None, [str(e)]
+      if errors:
+        report.rejected.append((line, errors))
+      else:
+        valid.append((line, prepared))
+    if entity == 'shows':
+      valid, rejected = resolve_shows(valid)
+      report.rejected.extend(rejected)
+      # against the shows stored so far, earlier chunks included
+      valid, rejected = schedule.check(valid)
+      report.rejected.extend(rejected)
+      groups.update('venue:%d' % show['venue_id'] for line, show in valid)
+      groups.update('artist:%d' % show['artist_id'] for line, show in valid)
+    # rows without an id take one from the sequence
+    with_ids = [row for line, row in valid if row['id'] is not None]
+    without_ids = [{key: value for key, value in row.items() if key != 'id'} for line, row in valid if row['id'] is None]
+    explicit_ids = explicit_ids or bool(with_ids)
+    try:
+      write_rows(model, with_ids)
+      write_rows(model, without_ids)
+      if entity == 'shows':
+        summaries.refresh(Venue, [show['venue_id'] for line, show in valid])
+        summaries.refresh(Artist, [show['artist_id'] for line, show in valid])
+      db.session.commit()
+    except Exception:
+      db.session.rollback()
+      raise
+    report.imported += len(valid)
+  if explicit_ids:
+    sync_sequence(model)
+  return report
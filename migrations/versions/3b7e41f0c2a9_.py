@@ -0,0 +1,41 @@
+"""trigram search indexes
+
+Revision ID: 3b7e41f0c2a9
+Revises: f751bc71e6a8
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e41f0c2a9'
+down_revision = 'f751bc71e6a8'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('name', 'city', 'state')
+
+
+def upgrade():
+    # Only PostgreSQL has pg_trgm; SQLite databases get FTS5 tables from
+    # `flask search-index` instead.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        for column in SEARCH_COLUMNS:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table, column), table, [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('venue', 'artist'):
+        for column in SEARCH_COLUMNS:
+            op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
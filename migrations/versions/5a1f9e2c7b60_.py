@@ -0,0 +1,26 @@
+"""updated_at timestamps
+
+Revision ID: 5a1f9e2c7b60
+Revises: 9d04c6a1e5f3
+Create Date: 2026-10-18 12:20:05.662871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1f9e2c7b60'
+down_revision = '9d04c6a1e5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'updated_at')
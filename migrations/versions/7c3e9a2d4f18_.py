@@ -0,0 +1,43 @@
+"""show summaries per venue and artist
+
+Revision ID: 7c3e9a2d4f18
+Revises: 5a1f9e2c7b60
+Create Date: 2026-10-18 14:05:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a2d4f18'
+down_revision = '5a1f9e2c7b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for entity in ('venue', 'artist'):
+        op.create_table(entity + '_summary',
+        sa.Column(entity + '_id', sa.Integer(), nullable=False),
+        sa.Column('upcoming_count', sa.Integer(), nullable=False),
+        sa.Column('past_count', sa.Integer(), nullable=False),
+        sa.Column('next_show_time', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint([entity + '_id'], [entity + '.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(entity + '_id')
+        )
+        op.create_index('ix_{}_summary_next_show_time'.format(entity), entity + '_summary', ['next_show_time'], unique=False)
+        # backfill from the existing shows
+        op.execute(
+            'INSERT INTO {0}_summary ({0}_id, upcoming_count, past_count, next_show_time) '
+            'SELECT {0}_id, count(*) FILTER (WHERE start_time >= localtimestamp), '
+            'count(*) FILTER (WHERE start_time < localtimestamp), '
+            'min(start_time) FILTER (WHERE start_time >= localtimestamp) '
+            'FROM show GROUP BY {0}_id'.format(entity))
+
+
+def downgrade():
+    for entity in ('artist', 'venue'):
+        op.drop_index('ix_{}_summary_next_show_time'.format(entity), table_name=entity + '_summary')
+        op.drop_table(entity + '_summary')
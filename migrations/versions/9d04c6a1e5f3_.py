@@ -0,0 +1,36 @@
+"""show, venue and genre indexes
+
+Revision ID: 9d04c6a1e5f3
+Revises: 3b7e41f0c2a9
+Create Date: 2026-10-18 11:03:27.904410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d04c6a1e5f3'
+down_revision = '3b7e41f0c2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'])
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'])
+    op.create_index('ix_venue_state_city', 'venue', ['state', 'city'])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_venue_genres', 'venue', ['genres'], postgresql_using='gin')
+        op.create_index('ix_artist_genres', 'artist', ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_artist_genres', table_name='artist')
+        op.drop_index('ix_venue_genres', table_name='venue')
+    op.drop_index('ix_venue_state_city', table_name='venue')
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,37 @@
+"""venue coordinates and spatial indexes
+
+Revision ID: a93c5e17b2d8
+Revises: e28f5b6d1a47
+Create Date: 2026-10-18 20:14:36.281905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93c5e17b2d8'
+down_revision = 'e28f5b6d1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_venue_geohash', 'venue', ['geohash'])
+    if op.get_bind().dialect.name == 'postgresql':
+        # the built-in point type's GiST opclass answers "point <@ box";
+        # repository.in_box uses the same expression
+        op.execute('CREATE INDEX ix_venue_location ON venue USING gist (point(longitude, latitude))')
+    # existing venues are placed by `flask geocode`
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_venue_location', table_name='venue')
+    op.drop_index('ix_venue_geohash', table_name='venue')
+    op.drop_column('venue', 'geohash')
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
@@ -0,0 +1,96 @@
+"""partition show by month of start_time
+
+Revision ID: b41d7e0a9c35
+Revises: 7c3e9a2d4f18
+Create Date: 2026-10-18 16:32:10.504417
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41d7e0a9c35'
+down_revision = '7c3e9a2d4f18'
+branch_labels = None
+depends_on = None
+
+# partitions created ahead of the current month; `flask partitions` keeps
+# extending them
+MONTHS_AHEAD = 12
+
+INDEXES = (
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', ['start_time', 'id']),
+)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    op.rename_table('show', 'show_unpartitioned')
+    op.execute('ALTER TABLE show_unpartitioned RENAME CONSTRAINT show_pkey TO show_unpartitioned_pkey')
+    for name, columns in INDEXES:
+        op.drop_index(name, table_name='show_unpartitioned')
+
+    # the primary key of a partitioned table must include the partition key;
+    # ids still come from the one sequence
+    op.execute(
+        'CREATE TABLE show ('
+        "id integer NOT NULL DEFAULT nextval('show_id_seq'), "
+        'venue_id integer NOT NULL REFERENCES venue (id), '
+        'artist_id integer NOT NULL REFERENCES artist (id), '
+        'start_time timestamp without time zone NOT NULL, '
+        'updated_at timestamp without time zone NOT NULL DEFAULT now(), '
+        'PRIMARY KEY (id, start_time)'
+        ') PARTITION BY RANGE (start_time)')
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.execute('CREATE TABLE show_default PARTITION OF show DEFAULT')
+
+    first = op.get_bind().execute(sa.text('SELECT min(start_time) FROM show_unpartitioned')).scalar()
+    now = datetime.now()
+    month = datetime((first or now).year, (first or now).month, 1)
+    last = add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            "CREATE TABLE show_p{0:%Y_%m} PARTITION OF show FOR VALUES FROM ('{0:%Y-%m-%d}') TO ('{1:%Y-%m-%d}')"
+            .format(month, add_months(month, 1)))
+        month = add_months(month, 1)
+
+    for name, columns in INDEXES:
+        op.create_index(name, 'show', columns)
+    op.execute(
+        'INSERT INTO show (id, venue_id, artist_id, start_time, updated_at) '
+        'SELECT id, venue_id, artist_id, start_time, updated_at FROM show_unpartitioned')
+    op.drop_table('show_unpartitioned')
+
+
+def downgrade():
+    op.rename_table('show', 'show_partitioned')
+    for name, columns in INDEXES:
+        op.execute('ALTER INDEX {0} RENAME TO {0}_partitioned'.format(name))
+    op.execute('ALTER TABLE show_partitioned RENAME CONSTRAINT show_pkey TO show_partitioned_pkey')
+
+    op.create_table('show',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('show_id_seq')"), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE show_id_seq OWNED BY show.id')
+    op.execute(
+        'INSERT INTO show (id, venue_id, artist_id, start_time, updated_at) '
+        'SELECT id, venue_id, artist_id, start_time, updated_at FROM show_partitioned')
+    # dropping the parent drops every partition
+    op.drop_table('show_partitioned')
+    for name, columns in INDEXES:
+        op.create_index(name, 'show', columns)
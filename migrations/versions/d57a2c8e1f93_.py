@@ -0,0 +1,39 @@
+"""show end time
+
+Revision ID: d57a2c8e1f93
+Revises: a93c5e17b2d8
+Create Date: 2026-10-18 21:36:05.617238
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd57a2c8e1f93'
+down_revision = 'a93c5e17b2d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the default two hours (models.show.DEFAULT_DURATION)
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute("UPDATE show SET end_time = start_time + interval '2 hours'")
+    op.alter_column('show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_show_end_after_start', 'show', 'end_time > start_time')
+    # the overlap exclusion constraints are added per partition by
+    # `flask partitions`, which reports the partitions whose existing shows
+    # overlap instead of failing the migration
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+
+def downgrade():
+    op.execute(
+        "DO $$ DECLARE c record; BEGIN "
+        "FOR c IN SELECT conrelid::regclass AS rel, conname FROM pg_constraint "
+        "WHERE contype = 'x' AND conname LIKE 'show%\\_overlap' LOOP "
+        "EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', c.rel, c.conname); "
+        "END LOOP; END $$")
+    op.drop_constraint('ck_show_end_after_start', 'show', type_='check')
+    op.drop_column('show', 'end_time')
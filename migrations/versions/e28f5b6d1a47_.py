@@ -0,0 +1,50 @@
+"""genre facets
+
+Revision ID: e28f5b6d1a47
+Revises: b41d7e0a9c35
+Create Date: 2026-10-18 18:47:52.119036
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e28f5b6d1a47'
+down_revision = 'b41d7e0a9c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('genre_summary',
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('venue_count', sa.Integer(), nullable=False),
+    sa.Column('artist_count', sa.Integer(), nullable=False),
+    sa.Column('upcoming_venue_count', sa.Integer(), nullable=False),
+    sa.Column('upcoming_artist_count', sa.Integer(), nullable=False),
+    sa.Column('upcoming_show_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('genre')
+    )
+    # backfill from the genre arrays and the show summaries
+    op.execute(
+        'WITH venues AS ('
+        'SELECT genre, count(*) AS total, count(*) FILTER (WHERE s.upcoming_count > 0) AS upcoming '
+        'FROM venue CROSS JOIN LATERAL unnest(venue.genres) AS genre '
+        'LEFT JOIN venue_summary s ON s.venue_id = venue.id GROUP BY genre'
+        '), artists AS ('
+        'SELECT genre, count(*) AS total, count(*) FILTER (WHERE s.upcoming_count > 0) AS upcoming, '
+        'coalesce(sum(s.upcoming_count), 0) AS shows '
+        'FROM artist CROSS JOIN LATERAL unnest(artist.genres) AS genre '
+        'LEFT JOIN artist_summary s ON s.artist_id = artist.id GROUP BY genre'
+        ') '
+        'INSERT INTO genre_summary (genre, venue_count, artist_count, upcoming_venue_count, '
+        'upcoming_artist_count, upcoming_show_count) '
+        'SELECT coalesce(venues.genre, artists.genre), coalesce(venues.total, 0), coalesce(artists.total, 0), '
+        'coalesce(venues.upcoming, 0), coalesce(artists.upcoming, 0), coalesce(artists.shows, 0) '
+        'FROM venues FULL JOIN artists ON artists.genre = venues.genre')
+
+
+def downgrade():
+    op.drop_table('genre_summary')
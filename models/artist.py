@@ -1,4 +1,6 @@
-from app import db
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from extensions import db
 
 class Artist(db.Model):
   __tablename__ = 'artist'
@@ -8,12 +10,13 @@ class Artist(db.Model):
   city = db.Column(db.String(120))
   state = db.Column(db.String(120))
   phone = db.Column(db.String(120))
-  genres = db.Column(db.ARRAY(db.String))
+  genres = db.Column(postgresql.ARRAY(db.String).with_variant(db.JSON, 'sqlite'))
   image_link = db.Column(db.String(500))
   facebook_link = db.Column(db.String(120))
   website = db.Column(db.String(120))
   seeking_venue = db.Column(db.Boolean)
   seeking_description = db.Column(db.String())
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
   shows = db.relationship('Show', backref='artist', lazy=True)
 
   def __repr__(self):
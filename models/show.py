@@ -1,12 +1,34 @@
-from app import db
+from datetime import datetime, timedelta
+from extensions import db
 
+# a show given no end time is booked for DEFAULT_DURATION; none may run
+# longer than MAX_DURATION, which bounds the overlap queries in schedule.py
+DEFAULT_DURATION = timedelta(hours=2)
+MAX_DURATION = timedelta(hours=24)
+
+def default_end_time(context):
+  return context.get_current_parameters()['start_time'] + DEFAULT_DURATION
+
+# On PostgreSQL the table is partitioned by month of start_time (see
+# partitions.py) and its primary key is (id, start_time); ids stay unique
+# through the sequence. Overlapping bookings of a venue or an artist are
+# refused by schedule.py and, on PostgreSQL, by the exclusion constraints
+# partitions.constrain() adds to each partition.
 class Show(db.Model):
   __tablename__ = 'show'
+  __table_args__ = (
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    db.CheckConstraint('end_time > start_time', name='ck_show_end_after_start'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
   artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
   start_time = db.Column(db.DateTime, nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False, default=default_end_time)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
 
   def __repr__(self):
-    return f'<Show id: {self.id}, venue_id: {self.venue_id}, artist_id: {self.artist_id}, start_time: {self.start_time}>'
\ No newline at end of file
+    return f'<Show id: {self.id}, venue_id: {self.venue_id}, artist_id: {self.artist_id}, start_time: {self.start_time}, end_time: {self.end_time}>'
\ No newline at end of file
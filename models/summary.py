@@ -0,0 +1,51 @@
+from datetime import datetime
+from extensions import db
+
+# Show counts per venue and per artist, kept up to date by summaries.py. An
+# entity without shows has no row. GenreSummary holds the genre facets.
+
+class VenueSummary(db.Model):
+  __tablename__ = 'venue_summary'
+  __table_args__ = (
+    db.Index('ix_venue_summary_next_show_time', 'next_show_time'),
+  )
+
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+  upcoming_count = db.Column(db.Integer, nullable=False, default=0)
+  past_count = db.Column(db.Integer, nullable=False, default=0)
+  next_show_time = db.Column(db.DateTime)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+
+  def __repr__(self):
+    return f'<VenueSummary venue_id: {self.venue_id}, upcoming_count: {self.upcoming_count}, past_count: {self.past_count}, next_show_time: {self.next_show_time}>'
+
+
+class ArtistSummary(db.Model):
+  __tablename__ = 'artist_summary'
+  __table_args__ = (
+    db.Index('ix_artist_summary_next_show_time', 'next_show_time'),
+  )
+
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+  upcoming_count = db.Column(db.Integer, nullable=False, default=0)
+  past_count = db.Column(db.Integer, nullable=False, default=0)
+  next_show_time = db.Column(db.DateTime)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+
+  def __repr__(self):
+    return f'<ArtistSummary artist_id: {self.artist_id}, upcoming_count: {self.upcoming_count}, past_count: {self.past_count}, next_show_time: {self.next_show_time}>'
+
+
+class GenreSummary(db.Model):
+  __tablename__ = 'genre_summary'
+
+  genre = db.Column(db.String, primary_key=True)
+  venue_count = db.Column(db.Integer, nullable=False, default=0)
+  artist_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_venue_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_artist_count = db.Column(db.Integer, nullable=False, default=0)
+  upcoming_show_count = db.Column(db.Integer, nullable=False, default=0)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
+
+  def __repr__(self):
+    return f'<GenreSummary genre: {self.genre}, venue_count: {self.venue_count}, artist_count: {self.artist_count}, upcoming_show_count: {self.upcoming_show_count}>'
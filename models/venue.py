@@ -1,11 +1,17 @@
-from app import db
+from datetime import datetime
+from sqlalchemy.dialects import postgresql
+from extensions import db
 
 class Venue(db.Model):
   __tablename__ = 'venue'
+  __table_args__ = (
+    db.Index('ix_venue_state_city', 'state', 'city'),
+    db.Index('ix_venue_geohash', 'geohash'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String, nullable=False)
-  genres = db.Column(db.ARRAY(db.String))
+  genres = db.Column(postgresql.ARRAY(db.String).with_variant(db.JSON, 'sqlite'))
   city = db.Column(db.String(120))
   state = db.Column(db.String(120))
   address = db.Column(db.String(120))
@@ -15,6 +21,11 @@ class Venue(db.Model):
   website = db.Column(db.String(120))
   seeking_talent = db.Column(db.Boolean)
   seeking_description = db.Column(db.String())
+  # filled by geocoding.py; see geo.py for the geohash
+  latitude = db.Column(db.Float)
+  longitude = db.Column(db.Float)
+  geohash = db.Column(db.String(12))
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.func.now())
   shows = db.relationship('Show', backref='venue', lazy=True)
 
   def __repr__(self):
@@ -0,0 +1,158 @@
+import gzip
+import os
+from datetime import datetime
+from sqlalchemy import column, select, table, text
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+import exporter
+import summaries
+
+#----------------------------------------------------------------------------#
+# Monthly show partitions (PostgreSQL).
+#
+# The show table is range-partitioned on start_time, one partition per
+# calendar month named show_pYYYY_MM, plus show_default for anything outside
+# them. Queries bounded on start_time (upcoming shows, a cursor page) only
+# open the partitions of the months they can match. ensure() creates the
+# partitions for the months ahead, moving rows out of show_default when they
+# already landed there; archive() detaches the partitions of old months,
+# writes their rows to gzipped CSV files that `flask import` can read back,
+# and drops them.
+#
+# A partitioned table cannot carry an exclusion constraint on a range of its
+# partition key, so constrain() adds the overlap constraints to each
+# partition instead: no venue or artist is booked twice within one month's
+# partition. Bookings overlapping across a month boundary are left to the
+# check in schedule.py.
+#----------------------------------------------------------------------------#
+
+PARENT = 'show'
+DEFAULT = 'show_default'
+
+def month_start(value):
+  return datetime(value.year, value.month, 1)
+
+def add_months(month, count):
+  index = month.year * 12 + month.month - 1 + count
+  return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+  return 'show_p%04d_%02d' % (month.year, month.month)
+
+def partition_month(name):
+  return datetime.strptime(name, 'show_p%Y_%m')
+
+def list_partitions():
+  """Return the monthly partitions of show as {month: name}."""
+  rows = db.session.execute(text(
+    "SELECT child.relname FROM pg_inherits "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+    "WHERE parent.relname = :parent AND child.relname <> :default"),
+    {'parent': PARENT, 'default': DEFAULT})
+  return {partition_month(name): name for name, in rows}
+
+def create_partition(month):
+  name = partition_name(month)
+  bounds = {'start': month, 'end': add_months(month, 1)}
+  # a partition cannot be attached over rows the default partition holds for
+  # its range, so those are moved into the new table first
+  db.session.execute(text(
+    'CREATE TABLE "{}" (LIKE "{}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name, PARENT)))
+  db.session.execute(text(
+    'WITH moved AS (DELETE FROM "{1}" WHERE start_time >= :start AND start_time < :end RETURNING *) '
+    'INSERT INTO "{0}" SELECT * FROM moved'.format(name, DEFAULT)), bounds)
+  db.session.execute(text(
+    'ALTER TABLE "{}" ATTACH PARTITION "{}" FOR VALUES FROM (\'{:%Y-%m-%d}\') TO (\'{:%Y-%m-%d}\')'.format(
+      PARENT, name, bounds['start'], bounds['end'])))
+  constrain([name])
+  return name
+
+# constraint name suffix -> EXCLUDE elements; the integer equality needs the
+# btree_gist extension
+EXCLUSIONS = {
+  'venue_overlap': 'venue_id WITH =, tsrange(start_time, end_time) WITH &&',
+  'artist_overlap': 'artist_id WITH =, tsrange(start_time, end_time) WITH &&',
+}
+
+def constrain(names):
+  """Add the missing overlap constraints to the given partitions.
+
+  Returns the (partition, constraint) pairs that could not be added because
+  the partition already holds overlapping shows; the others are kept.
+  """
+  existing = {tuple(row) for row in db.session.execute(text(
+    "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'x'"))}
+  failed = []
+  for name in names:
+    for suffix, elements in EXCLUSIONS.items():
+      constraint = name + '_' + suffix
+      if (name, constraint) in existing:
+        continue
+      try:
+        with db.session.begin_nested():
+          db.session.execute(text('ALTER TABLE "{}" ADD CONSTRAINT "{}" EXCLUDE USING gist ({})'.format(
+            name, constraint, elements)))
+      except IntegrityError:
+        failed.append((name, constraint))
+  return failed
+
+def ensure(months_ahead, now=None):
+  """Create the missing partitions from this month to months_ahead months ahead."""
+  current = month_start(now or datetime.now())
+  existing = list_partitions()
+  created = []
+  for offset in range(months_ahead + 1):
+    month = add_months(current, offset)
+    if month not in existing:
+      created.append(create_partition(month))
+  return created
+
+def _write_archive(name, path):
+  columns = list(Show.__table__.columns)
+  rows = db.session.execute(select(*[column(show_column.name) for show_column in columns]).select_from(table(name)))
+  venue_ids, artist_ids = set(), set()
+  def tracked():
+    for row in rows:
+      venue_ids.add(row.venue_id)
+      artist_ids.add(row.artist_id)
+      yield row
+  # write to a temporary name so a partial file is never taken for an archive
+  with gzip.open(path + '.tmp', 'wb') as output:
+    for chunk in exporter.csv_chunks(columns, tracked()):
+      output.write(chunk)
+  os.replace(path + '.tmp', path)
+  return venue_ids, artist_ids
+
+def _entity_ids(name):
+  rows = db.session.execute(select(column('venue_id'), column('artist_id')).select_from(table(name)).distinct()).all()
+  return {row.venue_id for row in rows}, {row.artist_id for row in rows}
+
+def archive(before, directory, drop=True):
+  """Detach the partitions of months before `before`, archive and drop them.
+
+  Each partition is handled in its own transaction. Returns (name, path,
+  venue_ids, artist_ids) per partition. With drop=False the detached tables
+  are left in place and no archive is written.
+  """
+  archived = []
+  for month, name in sorted(list_partitions().items()):
+    if month >= month_start(before):
+      break
+    db.session.execute(text('ALTER TABLE "{}" DETACH PARTITION "{}"'.format(PARENT, name)))
+    if drop:
+      path = os.path.join(directory, name + '.csv.gz')
+      venue_ids, artist_ids = _write_archive(name, path)
+      db.session.execute(text('DROP TABLE "{}"'.format(name)))
+    else:
+      path = None
+      venue_ids, artist_ids = _entity_ids(name)
+    # the detached shows no longer count towards the summaries
+    summaries.refresh(Venue, venue_ids)
+    summaries.refresh(Artist, artist_ids)
+    db.session.commit()
+    archived.append((name, path, venue_ids, artist_ids))
+  return archived
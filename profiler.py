@@ -0,0 +1,107 @@
+import json
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL profiling.
+#
+# Every statement run while a request is being handled is timed and reduced
+# to its shape (bind parameters and expanded IN lists collapsed). A shape
+# repeated SQL_N_PLUS_ONE_THRESHOLD times or more in one request is reported
+# as an N+1. Results go out as a Server-Timing header and one JSON log line
+# per request; with SQL_PROFILER_RAISE set in testing mode, an N+1 or a
+# request over SQL_QUERY_BUDGET fails the request.
+#----------------------------------------------------------------------------#
+
+_BIND = re.compile(r"%\(\w+?(?:_\d+)?\)s|\?|:\w+|\$\d+")
+_IN_LIST = re.compile(r"\(\s*(?:BIND\s*,\s*)+BIND\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def statement_shape(statement):
+  shape = _BIND.sub('BIND', statement)
+  shape = _IN_LIST.sub('(BIND...)', shape)
+  return _SPACE.sub(' ', shape).strip()
+
+
+class QueryBudgetExceeded(Exception):
+  pass
+
+
+class RequestProfile(object):
+  def __init__(self):
+    self.count = 0
+    self.duration = 0.0
+    self.shapes = Counter()
+
+  def record(self, statement, duration):
+    self.count += 1
+    self.duration += duration
+    self.shapes[statement_shape(statement)] += 1
+
+  def repeated(self, threshold):
+    return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryProfiler(object):
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.config.setdefault('SQL_PROFILER', True)
+    app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('SQL_QUERY_BUDGET', None)
+    app.config.setdefault('SQL_PROFILER_RAISE', False)
+    if not app.config['SQL_PROFILER']:
+      return
+    # listening on the Engine class covers every engine the app creates
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(self._start)
+    app.after_request(self._finish)
+    app.extensions['query_profiler'] = self
+
+  def _start(self):
+    g.sql_profile = RequestProfile()
+
+  def _finish(self, response):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+      return response
+    config = current_app.config
+    repeated = profile.repeated(config['SQL_N_PLUS_ONE_THRESHOLD'])
+    over_budget = config['SQL_QUERY_BUDGET'] is not None and profile.count > config['SQL_QUERY_BUDGET']
+
+    response.headers.add('Server-Timing', 'db;dur=%.2f;desc="%d queries"' % (profile.duration * 1000, profile.count))
+    current_app.logger.info(json.dumps({
+      'event': 'sql_profile',
+      'method': request.method,
+      'path': request.path,
+      'endpoint': request.endpoint,
+      'status': response.status_code,
+      'queries': profile.count,
+      'db_ms': round(profile.duration * 1000, 2),
+      'n_plus_one': [{'statement': shape, 'count': count} for shape, count in repeated]
+    }))
+
+    if config['SQL_PROFILER_RAISE'] and current_app.testing and (repeated or over_budget):
+      problems = ['%d queries, budget %d' % (profile.count, config['SQL_QUERY_BUDGET'])] if over_budget else []
+      problems += ['%dx %s' % (count, shape) for shape, count in repeated]
+      raise QueryBudgetExceeded(request.path + ': ' + '; '.join(problems))
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info['query_start_time'].pop()
+  if has_request_context():
+    profile = g.get('sql_profile')
+    if profile is not None:
+      profile.record(statement, time.perf_counter() - started)
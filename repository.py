@@ -0,0 +1,496 @@
+from datetime import datetime
+from functools import wraps
+from itertools import groupby
+from flask import abort
+from sqlalchemy import Boolean, and_, or_, func, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import ColumnElement, bindparam
+from sqlalchemy.sql.visitors import InternalTraversal
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+from models.summary import VenueSummary, ArtistSummary, GenreSummary
+import geo
+import schedule
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def _as_dict(entity):
+  return {column.name: getattr(entity, column.name) for column in entity.__table__.columns}
+
+def _format_start_time(start_time):
+  return start_time.isoformat(timespec='milliseconds') + "Z"
+
+def split_shows(rows, prefix, now=None):
+  # rows come back ordered by start_time, so a single pass keeps both lists sorted
+  now = now or datetime.now()
+  upcoming_shows = []
+  past_shows = []
+  for row in rows:
+    show_details = {
+      prefix + "_id": row.id,
+      prefix + "_name": row.name,
+      prefix + "_image_link": row.image_link,
+      "start_time": _format_start_time(row.start_time)
+    }
+    if row.start_time >= now:
+      upcoming_shows.append(show_details)
+    else:
+      past_shows.append(show_details)
+  return upcoming_shows, past_shows
+
+def encode_cursor(start_time, show_id):
+  return start_time.isoformat() + "," + str(show_id)
+
+def decode_cursor(cursor):
+  try:
+    start_time, show_id = cursor.split(",")
+    return datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
+
+def _with_shows(data, upcoming_shows, past_shows):
+  data["upcoming_shows"] = upcoming_shows
+  data["past_shows"] = past_shows
+  data["upcoming_shows_count"] = len(upcoming_shows)
+  data["past_shows_count"] = len(past_shows)
+  return data
+
+#----------------------------------------------------------------------------#
+# Filters.
+#
+# Listings take a list of conditions built here. A genre matches with array
+# containment on PostgreSQL, which the GIN indexes on venue.genres and
+# artist.genres answer, and through json_each on SQLite, where genres are
+# stored as JSON.
+#----------------------------------------------------------------------------#
+
+class has_genre(ColumnElement):
+  type = Boolean()
+  inherit_cache = True
+  _traverse_internals = [
+    ('column', InternalTraversal.dp_clauseelement),
+    ('genre', InternalTraversal.dp_clauseelement),
+  ]
+
+  def __init__(self, column, genre):
+    self.column = column
+    self.genre = bindparam('genre', genre, unique=True)
+
+@compiles(has_genre)
+def _has_genre_json(element, compiler, **kw):
+  return 'EXISTS (SELECT 1 FROM json_each(%s) WHERE value = %s)' % (
+    compiler.process(element.column, **kw), compiler.process(element.genre, **kw))
+
+@compiles(has_genre, 'postgresql')
+def _has_genre_array(element, compiler, **kw):
+  return '%s @> ARRAY[CAST(%s AS VARCHAR)]' % (
+    compiler.process(element.column, **kw), compiler.process(element.genre, **kw))
+
+UPCOMING_SUMMARIES = {
+  Venue: (VenueSummary.venue_id, VenueSummary.upcoming_count),
+  Artist: (ArtistSummary.artist_id, ArtistSummary.upcoming_count),
+}
+
+def listing_filters(model, genre=None, state=None, city=None, upcoming=False):
+  """Conditions on venues or artists: a genre, an area, having upcoming shows."""
+  conditions = []
+  if genre:
+    conditions.append(has_genre(model.genres, genre))
+  if state:
+    conditions.append(model.state == state)
+  if city:
+    conditions.append(model.city == city)
+  if upcoming:
+    key, upcoming_count = UPCOMING_SUMMARIES[model]
+    conditions.append(model.id.in_(select(key).where(upcoming_count > 0)))
+  return conditions
+
+def show_filters(genre=None, state=None, city=None, upcoming=False, now=None, start=None, end=None):
+  """Conditions on shows: the artist's genre, the venue's area, not started yet, starting in [start, end)."""
+  conditions = []
+  if genre:
+    conditions.append(Show.artist_id.in_(select(Artist.id).where(has_genre(Artist.genres, genre))))
+  if state or city:
+    conditions.append(Show.venue_id.in_(select(Venue.id).where(*listing_filters(Venue, state=state, city=city))))
+  if upcoming:
+    conditions.append(Show.start_time >= (now or datetime.now()))
+  if start:
+    conditions.append(Show.start_time >= start)
+  if end:
+    conditions.append(Show.start_time < end)
+  return conditions
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def _shows(key, entity_id, counterpart, counterpart_key, prefix):
+  # upcoming and past shows are fetched separately, split at now, so on the
+  # partitioned show table the upcoming query only opens the partitions of
+  # the current and later months. The past query is not bounded below: the
+  # page lists the whole history, so it reads every older partition (through
+  # the (key, start_time) index of each)
+  now = datetime.now()
+  query = db.session.query(Show.start_time, counterpart.id, counterpart.name, counterpart.image_link) \
+    .join(counterpart, counterpart.id == counterpart_key) \
+    .filter(key == entity_id) \
+    .order_by(Show.start_time, Show.id)
+  past_rows = query.filter(Show.start_time < now).all()
+  upcoming_rows = query.filter(Show.start_time >= now).all()
+  return split_shows(past_rows + upcoming_rows, prefix, now)
+
+def venue_shows(venue_id):
+  return _shows(Show.venue_id, venue_id, Artist, Show.artist_id, "artist")
+
+def artist_shows(artist_id):
+  return _shows(Show.artist_id, artist_id, Venue, Show.venue_id, "venue")
+
+def get_venue_detail(venue_id):
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+  upcoming_shows, past_shows = venue_shows(venue_id)
+  return _with_shows(_as_dict(venue), upcoming_shows, past_shows)
+
+def get_artist_detail(artist_id):
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    abort(404)
+  upcoming_shows, past_shows = artist_shows(artist_id)
+  return _with_shows(_as_dict(artist), upcoming_shows, past_shows)
+
+def get_entity(model, entity_id, fields):
+  # only the requested columns are selected
+  row = model.query.with_entities(model.id, *[getattr(model, field) for field in fields]) \
+    .filter(model.id == entity_id) \
+    .first()
+  if row is None:
+    abort(404)
+  return dict(zip(fields, row[1:]))
+
+#----------------------------------------------------------------------------#
+# Related entities.
+#----------------------------------------------------------------------------#
+
+def venue_artist_ids(venue_id):
+  rows = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return [row.artist_id for row in rows]
+
+def artist_venue_ids(artist_id):
+  rows = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return [row.venue_id for row in rows]
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+SHOW_FIELDS = {
+  "id": Show.id,
+  "venue_id": Show.venue_id,
+  "venue_name": Venue.name,
+  "venue_image_link": Venue.image_link,
+  "artist_id": Show.artist_id,
+  "artist_name": Artist.name,
+  "artist_image_link": Artist.image_link,
+  "start_time": Show.start_time,
+  "end_time": Show.end_time
+}
+
+PAGE_SHOW_FIELDS = ("venue_id", "venue_name", "artist_id", "artist_name", "artist_image_link", "start_time")
+
+def shows_page_statement(cursor=None, limit=100, fields=PAGE_SHOW_FIELDS, filters=()):
+  # keyset pagination on (start_time, id): every page is an index range scan,
+  # no matter how deep into the table it is
+  columns = [SHOW_FIELDS[field].label(field) for field in fields]
+  statement = select(Show.id.label("_id"), Show.start_time.label("_start_time"), *columns) \
+    .select_from(Show)
+  # counterparts are joined only when one of their columns was asked for
+  if any(SHOW_FIELDS[field].class_ is Venue for field in fields):
+    statement = statement.join(Venue, Venue.id == Show.venue_id)
+  if any(SHOW_FIELDS[field].class_ is Artist for field in fields):
+    statement = statement.join(Artist, Artist.id == Show.artist_id)
+  if cursor:
+    start_time, show_id = decode_cursor(cursor)
+    statement = statement.where(or_(
+      Show.start_time > start_time,
+      and_(Show.start_time == start_time, Show.id > show_id)))
+  return statement.where(*filters).order_by(Show.start_time, Show.id).limit(limit + 1)
+
+def shows_page(rows, limit, fields):
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]._start_time, rows[-1]._id)
+
+  data = []
+  for row in rows:
+    show_details = dict(zip(fields, row[2:]))
+    if "start_time" in show_details:
+      show_details["start_time"] = _format_start_time(row._start_time)
+    if "end_time" in show_details:
+      show_details["end_time"] = _format_start_time(show_details["end_time"])
+    data.append(show_details)
+  return data, next_cursor
+
+def list_shows(cursor=None, limit=100, fields=PAGE_SHOW_FIELDS, filters=()):
+  rows = db.session.execute(shows_page_statement(cursor, limit, fields, filters)).all()
+  return shows_page(rows, limit, fields)
+
+def entities_page_statement(model, fields, cursor=None, limit=20, filters=()):
+  # keyset pagination on the primary key
+  statement = select(model.id.label("_id"), *[getattr(model, field) for field in fields])
+  if cursor:
+    try:
+      statement = statement.where(model.id > int(cursor))
+    except ValueError:
+      abort(400)
+  return statement.where(*filters).order_by(model.id).limit(limit + 1)
+
+def entities_page(rows, limit, fields):
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = str(rows[-1]._id)
+  return [dict(zip(fields, row[1:])) for row in rows], next_cursor
+
+def list_entities(model, fields, cursor=None, limit=20, filters=()):
+  rows = db.session.execute(entities_page_statement(model, fields, cursor, limit, filters)).all()
+  return entities_page(rows, limit, fields)
+
+def list_venue_areas(page=1, per_page=50, filters=()):
+  # one statement: page over the distinct areas, join their venues and their
+  # show summaries, then group the ordered rows in Python
+  areas = db.session.query(Venue.city, Venue.state) \
+    .filter(*filters) \
+    .distinct() \
+    .order_by(Venue.state, Venue.city) \
+    .limit(per_page + 1) \
+    .offset((page - 1) * per_page) \
+    .subquery()
+  rows = db.session.query(
+      Venue.id, Venue.name, Venue.city, Venue.state,
+      func.coalesce(VenueSummary.upcoming_count, 0).label("num_upcoming_shows")) \
+    .join(areas, and_(areas.c.city == Venue.city, areas.c.state == Venue.state)) \
+    .outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id) \
+    .filter(*filters) \
+    .order_by(Venue.state, Venue.city, Venue.name, Venue.id) \
+    .all()
+
+  data = []
+  for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+    data.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": venue.id,
+        "name": venue.name,
+        "num_upcoming_shows": venue.num_upcoming_shows
+      } for venue in venues]
+    })
+  has_next = len(data) > per_page
+  return data[:per_page], has_next
+
+#----------------------------------------------------------------------------#
+# Conflicts.
+#----------------------------------------------------------------------------#
+
+def _booking(show):
+  return {
+    "id": show["id"],
+    "venue_id": show["venue_id"],
+    "artist_id": show["artist_id"],
+    "start_time": _format_start_time(show["start_time"]),
+    "end_time": _format_start_time(show["end_time"])
+  }
+
+def list_conflicts(start, end):
+  """The double bookings of venues and artists during [start, end), per venue or artist."""
+  return [{kind + "_id": entity_id, "shows": [_booking(show), _booking(other)]}
+    for kind, entity_id, show, other in schedule.conflicts(start, end)]
+
+#----------------------------------------------------------------------------#
+# Proximity.
+#
+# in_box() matches the venues inside a (south, west, north, east) box. On
+# PostgreSQL that is point(longitude, latitude) <@ box, answered by the GiST
+# index ix_venue_location. Elsewhere the box is covered with a few geohash
+# cells, each a range scan on ix_venue_geohash, and the coordinates are
+# checked against the box itself. Candidates are then sorted by their exact
+# distance in Python.
+#----------------------------------------------------------------------------#
+
+class in_box(ColumnElement):
+  type = Boolean()
+  inherit_cache = True
+  _traverse_internals = [
+    ('cells', InternalTraversal.dp_clauseelement),
+    ('points', InternalTraversal.dp_clauseelement),
+  ]
+
+  def __init__(self, box):
+    south, west, north, east = box
+    self.cells = and_(
+      or_(*[Venue.geohash.between(*geo.prefix_range(prefix)) for prefix in geo.cover(box)]),
+      Venue.latitude.between(south, north),
+      Venue.longitude.between(west, east))
+    self.points = func.point(Venue.longitude, Venue.latitude) \
+      .op('<@')(func.box(func.point(west, south), func.point(east, north)))
+
+@compiles(in_box)
+def _in_box_geohash(element, compiler, **kw):
+  return '(%s)' % compiler.process(element.cells, **kw)
+
+@compiles(in_box, 'postgresql')
+def _in_box_point(element, compiler, **kw):
+  return '(%s)' % compiler.process(element.points, **kw)
+
+def upcoming_shows_by_venue(venue_ids, per_venue, now=None):
+  """Return {venue_id: its next per_venue shows}, in one windowed query."""
+  ranked = select(
+      Show.venue_id, Show.artist_id, Show.start_time,
+      func.row_number().over(partition_by=Show.venue_id, order_by=(Show.start_time, Show.id)).label("rank")) \
+    .where(Show.venue_id.in_(venue_ids), Show.start_time >= (now or datetime.now())) \
+    .subquery()
+  rows = db.session.execute(
+    select(ranked.c.venue_id, ranked.c.start_time, Artist.id, Artist.name, Artist.image_link)
+      .join(Artist, Artist.id == ranked.c.artist_id)
+      .where(ranked.c.rank <= per_venue)
+      .order_by(ranked.c.venue_id, ranked.c.rank)).all()
+  shows = {venue_id: [] for venue_id in venue_ids}
+  for row in rows:
+    shows[row.venue_id].append({
+      "artist_id": row.id,
+      "artist_name": row.name,
+      "artist_image_link": row.image_link,
+      "start_time": _format_start_time(row.start_time)
+    })
+  return shows
+
+def venues_near(latitude, longitude, box, radius_km=None, limit=20, shows_per_venue=3, filters=()):
+  """The venues in box nearest to (latitude, longitude), with their next shows.
+
+  With radius_km, venues further than that are left out; the box should be
+  geo.bounding_box() of the same radius.
+  """
+  rows = db.session.query(
+      Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.image_link,
+      Venue.latitude, Venue.longitude,
+      func.coalesce(VenueSummary.upcoming_count, 0).label("num_upcoming_shows")) \
+    .outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id) \
+    .filter(in_box(box), *filters) \
+    .all()
+  nearby = []
+  for row in rows:
+    distance = geo.distance_km(latitude, longitude, row.latitude, row.longitude)
+    if radius_km is None or distance <= radius_km:
+      nearby.append((distance, row.id, row))
+  nearby = sorted(nearby)[:limit]
+  shows = upcoming_shows_by_venue([row.id for distance, venue_id, row in nearby], shows_per_venue) \
+    if nearby and shows_per_venue else {}
+  data = []
+  for distance, venue_id, row in nearby:
+    venue = dict(row._mapping, distance_km=round(distance, 3))
+    venue["upcoming_shows"] = shows.get(venue_id, [])
+    data.append(venue)
+  return data
+
+#----------------------------------------------------------------------------#
+# Freshness.
+#
+# Each function returns (parts, last_modified) for conditional.conditional:
+# the values a page depends on, gathered in a few aggregate queries, or None
+# when the entity does not exist. The queries are built apart from the
+# session (function.build returns the statements and a function of their
+# first rows), so the async API computes the same ETags.
+#----------------------------------------------------------------------------#
+
+def _latest(*timestamps):
+  return max((timestamp for timestamp in timestamps if timestamp), default=None)
+
+def _upcoming_count(now):
+  return func.count(Show.id).filter(Show.start_time >= now)
+
+def freshness(build):
+  """Run the statements of build(*args) on the session and combine their first rows."""
+  @wraps(build)
+  def run(*args, **kwargs):
+    statements, state = build(*args, **kwargs)
+    return state([db.session.execute(statement).first() for statement in statements])
+  run.build = build
+  return run
+
+def _detail_state(rows):
+  # no row when the entity does not exist; the first three columns are the
+  # entity's, its shows' and their counterparts' latest updated_at
+  if rows[0] is None:
+    return None
+  return tuple(rows[0]), _latest(*rows[0][:3])
+
+@freshness
+def venue_freshness(venue_id, now=None):
+  statement = select(
+      Venue.updated_at,
+      func.max(Show.updated_at).label("shows_updated_at"),
+      func.max(Artist.updated_at).label("artists_updated_at"),
+      func.count(Show.id).label("num_shows"),
+      _upcoming_count(now or datetime.now()).label("num_upcoming_shows")) \
+    .select_from(Venue) \
+    .outerjoin(Show, Show.venue_id == Venue.id) \
+    .outerjoin(Artist, Artist.id == Show.artist_id) \
+    .where(Venue.id == venue_id) \
+    .group_by(Venue.id, Venue.updated_at)
+  return [statement], _detail_state
+
+@freshness
+def artist_freshness(artist_id, now=None):
+  statement = select(
+      Artist.updated_at,
+      func.max(Show.updated_at).label("shows_updated_at"),
+      func.max(Venue.updated_at).label("venues_updated_at"),
+      func.count(Show.id).label("num_shows"),
+      _upcoming_count(now or datetime.now()).label("num_upcoming_shows")) \
+    .select_from(Artist) \
+    .outerjoin(Show, Show.artist_id == Artist.id) \
+    .outerjoin(Venue, Venue.id == Show.venue_id) \
+    .where(Artist.id == artist_id) \
+    .group_by(Artist.id, Artist.updated_at)
+  return [statement], _detail_state
+
+def _genres_state():
+  # the genre facets shown on every listing; refresh_genres rewrites all rows
+  # when any count changes
+  return select(func.max(GenreSummary.updated_at), func.count()).select_from(GenreSummary)
+
+def _listing_state(rows):
+  # (entities, summaries, genres) rows, each led by its latest updated_at
+  return sum((tuple(row) for row in rows), ()), _latest(*(row[0] for row in rows))
+
+@freshness
+def venues_freshness():
+  return [
+    select(func.max(Venue.updated_at), func.count(Venue.id)),
+    select(func.max(VenueSummary.updated_at), func.count(), func.sum(VenueSummary.upcoming_count)).select_from(VenueSummary),
+    _genres_state(),
+  ], _listing_state
+
+@freshness
+def artists_freshness():
+  return [
+    select(func.max(Artist.updated_at), func.count(Artist.id)),
+    # ?upcoming=1 filters on the artist summaries
+    select(func.max(ArtistSummary.updated_at), func.count(), func.sum(ArtistSummary.upcoming_count)).select_from(ArtistSummary),
+    _genres_state(),
+  ], _listing_state
+
+@freshness
+def shows_freshness():
+  return [
+    select(func.max(Show.updated_at), func.count(Show.id)),
+    select(func.max(Venue.updated_at)),
+    select(func.max(Artist.updated_at)),
+    _genres_state(),
+  ], _listing_state
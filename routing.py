@@ -0,0 +1,145 @@
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine.url import make_url
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# Views decorated with @replicas.reads run their queries on a replica listed
+# in SQLALCHEMY_REPLICA_URIS; everything else, and any flush or DML statement,
+# goes to the primary. A session is pinned to one replica, so a request reads
+# from a single snapshot. Replicas are picked round-robin, and one that fails
+# to connect is skipped for REPLICA_RETRY_SECONDS. After a write, the user's
+# reads stay on the primary for REPLICA_STICKY_SECONDS (tracked in the Flask
+# session) so they see their own changes whatever the replication lag.
+# Pages stored in the response cache without an ETag in their key are
+# rendered from the primary as well (read_primary), since they are served
+# to everyone; the ETag-keyed ones stay on the replica.
+#----------------------------------------------------------------------------#
+
+# pool sizing only applies to PostgreSQL; SQLite uses a pool that takes none
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'connect_args')
+
+def _reads_from_replica():
+  return has_request_context() and g.get('db_route') == 'replica' and not g.get('db_wrote')
+
+
+def read_primary():
+  """Send the rest of this request's reads to the primary."""
+  if has_request_context():
+    g.db_route = 'primary'
+
+
+class RoutingSession(SignallingSession):
+  def get_bind(self, mapper=None, clause=None):
+    if getattr(clause, 'is_dml', False) or self._flushing:
+      if has_request_context():
+        g.db_wrote = True
+    elif _reads_from_replica():
+      if 'replica' not in self.info:
+        self.info['replica'] = current_app.extensions['replicas'].choose()
+      if self.info['replica'] is not None:
+        return self.info['replica']
+    return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def create_engine(self, sa_url, engine_opts):
+    if sa_url.get_backend_name() != 'postgresql':
+      engine_opts = {key: value for key, value in engine_opts.items() if key not in POOL_OPTIONS}
+    return SQLAlchemy.create_engine(self, sa_url, engine_opts)
+
+
+class ReplicaSet(object):
+  def __init__(self, app, uris):
+    self.app = app
+    self.uris = uris
+    self.engines = None
+    self.down_until = {}
+    self._lock = threading.Lock()
+
+  def _load(self):
+    # built the way Flask-SQLAlchemy builds the primary engine, with the same
+    # SQLALCHEMY_ENGINE_OPTIONS
+    from extensions import db
+    self.engines = []
+    for uri in self.uris:
+      options = db.apply_pool_defaults(self.app, {})
+      sa_url, options = db.apply_driver_hacks(self.app, make_url(uri), options)
+      options.update(self.app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+      self.engines.append(db.create_engine(sa_url, options))
+    self._cycle = itertools.cycle(self.engines)
+    for engine in self.engines:
+      event.listen(engine, 'handle_error', self._handle_error)
+
+  def _handle_error(self, context):
+    # connection failures arrive without a connection; drops are flagged
+    if context.is_disconnect or context.connection is None:
+      self.down_until[context.engine.url] = time.monotonic() + self.app.config['REPLICA_RETRY_SECONDS']
+      if has_request_context():
+        g.db_replica_failed = True
+
+  def dispose(self):
+    for engine in self.engines or ():
+      engine.dispose(close=False)
+
+  def choose(self):
+    """Return the next healthy replica engine, or None to use the primary."""
+    if not self.uris:
+      return None
+    now = time.monotonic()
+    with self._lock:
+      if self.engines is None:
+        self._load()
+      for _ in range(len(self.engines)):
+        engine = next(self._cycle)
+        if self.down_until.get(engine.url, 0) <= now:
+          return engine
+    return None
+
+
+class Replicas(object):
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+    app.config.setdefault('REPLICA_RETRY_SECONDS', 30)
+    app.extensions['replicas'] = ReplicaSet(app, app.config['SQLALCHEMY_REPLICA_URIS'])
+    app.after_request(self._remember_write)
+
+  def _remember_write(self, response):
+    if g.get('db_wrote') and current_app.config['SQLALCHEMY_REPLICA_URIS']:
+      session['db_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+  def reads(self, view):
+    """Route the queries of a read-only view to a replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      if session.get('db_primary_until', 0) <= time.time():
+        g.db_route = 'replica'
+      try:
+        return view(*args, **kwargs)
+      except DBAPIError:
+        # the replica could not be reached: it is now marked down, so run
+        # the view again, on the primary
+        if not g.pop('db_replica_failed', False):
+          raise
+        db_session = current_app.extensions['sqlalchemy'].db.session
+        db_session.rollback()
+        db_session.info.pop('replica', None)
+        g.db_route = 'primary'
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from sqlalchemy import or_, select
+from extensions import db
+from models.show import Show, MAX_DURATION
+
+#----------------------------------------------------------------------------#
+# Booking conflicts.
+#
+# A show books its venue and its artist for [start_time, end_time); two
+# shows conflict when they share either and their times overlap. Single
+# inserts ask the database (booked()); batches and the conflicts report load
+# the shows around them once and check them against an IntervalTree per
+# venue and per artist, so n shows cost O(n log n) plus the conflicts found
+# instead of comparing every pair. No show is longer than MAX_DURATION, which
+# turns "overlaps [start, end)" into a start_time range the show indexes
+# answer.
+#----------------------------------------------------------------------------#
+
+class IntervalTree(object):
+  """A static interval tree over half-open [start, end) intervals.
+
+  The intervals are kept sorted by start, as the in-order sequence of an
+  implicit balanced tree: the node for items[low:high] is items[middle], and
+  max_end[middle] is the latest end below it. A search skips every subtree
+  that ends before the query starts and, past the query's end, every right
+  subtree.
+  """
+
+  def __init__(self, intervals):
+    self.items = sorted(intervals, key=lambda item: (item[0], item[1]))
+    self.max_end = [None] * len(self.items)
+    self._build(0, len(self.items))
+
+  def _build(self, low, high):
+    if low >= high:
+      return None
+    middle = (low + high) // 2
+    end = self.items[middle][1]
+    for child in (self._build(low, middle), self._build(middle + 1, high)):
+      if child is not None and child > end:
+        end = child
+    self.max_end[middle] = end
+    return end
+
+  def overlapping(self, start, end):
+    """Return the (start, end, value) items overlapping [start, end), by start."""
+    found = []
+    self._search(0, len(self.items), start, end, found)
+    return found
+
+  def _search(self, low, high, start, end, found):
+    if low >= high:
+      return
+    middle = (low + high) // 2
+    if self.max_end[middle] <= start:
+      return
+    self._search(low, middle, start, end, found)
+    item = self.items[middle]
+    if item[0] < end:
+      if item[1] > start:
+        found.append(item)
+      self._search(middle + 1, high, start, end, found)
+
+
+def _overlapping(start, end):
+  # bounded on start_time, so the (venue_id, start_time) and
+  # (artist_id, start_time) indexes and the partitions of the months
+  # involved are all that is read
+  return [Show.start_time < end, Show.start_time > start - MAX_DURATION, Show.end_time > start]
+
+def booked(venue_id, artist_id, start_time, end_time):
+  """Return the shows that already book the venue or the artist during [start_time, end_time)."""
+  return db.session.execute(
+    select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+      .where(or_(Show.venue_id == venue_id, Show.artist_id == artist_id), *_overlapping(start_time, end_time))
+      .order_by(Show.start_time, Show.id)).all()
+
+def _trees(shows):
+  # one tree per venue and per artist; shows are (start, end, value) items
+  # whose value has venue_id and artist_id
+  groups = defaultdict(list)
+  for item in shows:
+    groups['venue', item[2]['venue_id']].append(item)
+    groups['artist', item[2]['artist_id']].append(item)
+  return {key: IntervalTree(items) for key, items in groups.items()}
+
+def _describe(kind, show):
+  if show.get('id') is None:
+    return '%s already booked by another show of the batch' % kind
+  return '%s already booked by show %d' % (kind, show['id'])
+
+def check(shows, replaced=()):
+  """Reject the shows of a batch that conflict with stored shows or with accepted shows before them.
+
+  shows are (key, show) pairs of prepared rows with venue_id, artist_id,
+  start_time and end_time; the stored shows whose ids are in replaced are
+  left out, as the batch overwrites them. Returns (accepted pairs, rejected
+  (key, errors) pairs).
+  """
+  if not shows:
+    return [], []
+  start = min(show['start_time'] for key, show in shows)
+  end = max(show['end_time'] for key, show in shows)
+  stored = db.session.execute(
+    select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+      .where(or_(Show.venue_id.in_({show['venue_id'] for key, show in shows}),
+                 Show.artist_id.in_({show['artist_id'] for key, show in shows})),
+             Show.id.notin_(replaced), *_overlapping(start, end))).all()
+  items = [(row.start_time, row.end_time, dict(row._mapping, position=None)) for row in stored]
+  items.extend((show['start_time'], show['end_time'], dict(show, position=position))
+    for position, (key, show) in enumerate(shows))
+  trees = _trees(items)
+  accepted_positions = set()
+  accepted, rejected = [], []
+  for position, (key, show) in enumerate(shows):
+    errors = []
+    for kind in ('venue', 'artist'):
+      for other_start, other_end, other in trees[kind, show[kind + '_id']].overlapping(show['start_time'], show['end_time']):
+        if other['position'] is None or other['position'] in accepted_positions:
+          errors.append(_describe(kind, other))
+          break
+    if errors:
+      rejected.append((key, errors))
+    else:
+      accepted_positions.add(position)
+      accepted.append((key, show))
+  return accepted, rejected
+
+def conflicts(start, end):
+  """Return every pair of shows that double-book a venue or an artist during [start, end).
+
+  Each conflict is (kind, venue or artist id, first show, second show), the
+  shows being rows ordered by start_time.
+  """
+  rows = db.session.execute(
+    select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+      .where(*_overlapping(start, end))).all()
+  found = []
+  for (kind, entity_id), tree in sorted(_trees([(row.start_time, row.end_time, row._mapping) for row in rows]).items()):
+    for show_start, show_end, show in tree.items:
+      for other_start, other_end, other in tree.overlapping(show_start, show_end):
+        # each pair once, from its earlier show
+        if (other_start, other['id']) > (show_start, show['id']):
+          found.append((kind, entity_id, show, other))
+  return found
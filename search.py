@@ -0,0 +1,121 @@
+from sqlalchemy import func, inspect, or_, text
+from extensions import db
+from forms import GENRES
+from models.venue import Venue
+from models.artist import Artist
+
+#----------------------------------------------------------------------------#
+# Ranked search for venues and artists.
+#
+# PostgreSQL uses the pg_trgm GIN indexes created by migration 3b7e41f0c2a9
+# and ranks by trigram similarity. SQLite uses FTS5 tables with the trigram
+# tokenizer (see `flask search-index`); any other backend, or a SQLite
+# database without the FTS tables, falls back to a plain LIKE scan.
+#----------------------------------------------------------------------------#
+
+FTS_COLUMNS = ('name', 'city', 'state', 'genres')
+
+# (database URL, table) -> whether the FTS table exists; keyed by URL as
+# apps and replicas in one process can point at different databases
+_fts_tables = {}
+
+def _escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _like_conditions(model, term):
+  pattern = '%' + _escape_like(term) + '%'
+  return [
+    model.name.ilike(pattern, escape='\\'),
+    model.city.ilike(pattern, escape='\\'),
+    model.state.ilike(pattern, escape='\\')
+  ]
+
+def _search_like(model, term, limit, offset):
+  return db.session.query(model.id, model.name, func.count().over().label('total')) \
+    .filter(or_(*_like_conditions(model, term))) \
+    .order_by(model.name, model.id) \
+    .limit(limit) \
+    .offset(offset) \
+    .all()
+
+def _search_postgresql(model, term, limit, offset):
+  conditions = _like_conditions(model, term)
+  genre = GENRES.get(term.lower())
+  if genre:
+    conditions.append(model.genres.contains([genre]))
+  rank = func.greatest(func.similarity(model.name, term), func.word_similarity(term, model.name))
+  return db.session.query(model.id, model.name, func.count().over().label('total')) \
+    .filter(or_(*conditions)) \
+    .order_by(rank.desc(), model.name, model.id) \
+    .limit(limit) \
+    .offset(offset) \
+    .all()
+
+def _has_fts_table(table):
+  # asked of the engine the search will run on, which may be a replica
+  engine = db.session().get_bind()
+  key = engine.url, table
+  if key not in _fts_tables:
+    _fts_tables[key] = inspect(engine).has_table(table)
+  return _fts_tables[key]
+
+def _search_sqlite(model, term, limit, offset):
+  table = model.__tablename__ + '_fts'
+  # the trigram tokenizer cannot match terms shorter than three characters
+  if len(term) < 3 or not _has_fts_table(table):
+    return _search_like(model, term, limit, offset)
+  query = text(
+    'SELECT id, name, count(*) OVER () AS total FROM ('
+    f'SELECT rowid AS id, name, bm25({table}) AS rank FROM {table} WHERE {table} MATCH :query'
+    ') ORDER BY rank, id LIMIT :limit OFFSET :offset')
+  return db.session.execute(query, {
+    'query': '"' + term.replace('"', '""') + '"',
+    'limit': limit,
+    'offset': offset
+  }).fetchall()
+
+def _search(model, term, limit, offset):
+  dialect = db.engine.dialect.name
+  if dialect == 'postgresql':
+    rows = _search_postgresql(model, term, limit, offset)
+  elif dialect == 'sqlite':
+    rows = _search_sqlite(model, term, limit, offset)
+  else:
+    rows = _search_like(model, term, limit, offset)
+  return {
+    "count": rows[0].total if rows else 0,
+    "data": [{"id": row.id, "name": row.name} for row in rows]
+  }
+
+def search_venues(term, limit=50, offset=0):
+  return _search(Venue, term, limit, offset)
+
+def search_artists(term, limit=50, offset=0):
+  return _search(Artist, term, limit, offset)
+
+#----------------------------------------------------------------------------#
+# SQLite FTS5 tables.
+#----------------------------------------------------------------------------#
+
+def create_sqlite_fts(connection):
+  for model in (Venue, Artist):
+    source = model.__tablename__
+    table = source + '_fts'
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join('new.' + column for column in FTS_COLUMNS)
+    old_values = ', '.join('old.' + column for column in FTS_COLUMNS)
+    connection.execute(text(
+      f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({columns}, "
+      f"content='{source}', content_rowid='id', tokenize='trigram')"))
+    connection.execute(text(
+      f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+      f"INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    connection.execute(text(
+      f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+      f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"))
+    connection.execute(text(
+      f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON {source} BEGIN "
+      f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+      f"INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    connection.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+    _fts_tables[connection.engine.url, table] = True
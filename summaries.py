@@ -0,0 +1,174 @@
+from datetime import datetime
+from sqlalchemy import bindparam, case, delete, func, insert, or_, select, true, update
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+from models.summary import VenueSummary, ArtistSummary, GenreSummary
+
+#----------------------------------------------------------------------------#
+# Show summaries.
+#
+# venue_summary and artist_summary hold each entity's upcoming and past show
+# counts and its next show time, so listings and counts read one row instead
+# of the show history. Adding a show bumps the counters in the same
+# transaction; bulk writes recompute the entities they touched. As time
+# passes, roll() moves the shows that have started from upcoming to past:
+# only summaries whose next_show_time has gone by are visited, and only the
+# shows between that time and now are counted. Run it every minute or so
+# with `flask roll-summaries`; counts are exact as of the last roll.
+#
+# genre_summary holds the genre facets: per genre, the venues and artists
+# that list it, how many of those have upcoming shows, and the upcoming
+# shows of its artists. It is recomputed by every roll.
+#----------------------------------------------------------------------------#
+
+# entity -> (summary model, summary key, show key)
+SUMMARIES = {
+  Venue: (VenueSummary, VenueSummary.venue_id, Show.venue_id),
+  Artist: (ArtistSummary, ArtistSummary.artist_id, Show.artist_id),
+}
+
+CHUNK_SIZE = 500
+
+def _chunks(ids):
+  ids = sorted(set(ids))
+  for start in range(0, len(ids), CHUNK_SIZE):
+    yield ids[start:start + CHUNK_SIZE]
+
+def _aggregate(show_key, now):
+  upcoming = Show.start_time >= now
+  return select(
+    show_key,
+    func.count(Show.id).filter(upcoming),
+    func.count(Show.id).filter(Show.start_time < now),
+    func.min(Show.start_time).filter(upcoming))
+
+def refresh(model, ids, now=None):
+  """Recompute the summaries of the given venues or artists from their shows."""
+  summary, key, show_key = SUMMARIES[model]
+  now = now or datetime.now()
+  for chunk in _chunks(ids):
+    db.session.execute(delete(summary.__table__).where(key.in_(chunk)))
+    db.session.execute(insert(summary.__table__).from_select(
+      [key.name, 'upcoming_count', 'past_count', 'next_show_time'],
+      _aggregate(show_key, now).where(show_key.in_(chunk)).group_by(show_key)))
+
+def rebuild(now=None):
+  """Recompute every summary."""
+  now = now or datetime.now()
+  for model, (summary, key, show_key) in SUMMARIES.items():
+    db.session.execute(delete(summary.__table__))
+    db.session.execute(insert(summary.__table__).from_select(
+      [key.name, 'upcoming_count', 'past_count', 'next_show_time'],
+      _aggregate(show_key, now).group_by(show_key)))
+  refresh_genres()
+
+def record_show(venue_id, artist_id, start_time, now=None):
+  """Count a new show; call after it has been flushed, before the commit."""
+  now = now or datetime.now()
+  for model, entity_id in ((Venue, venue_id), (Artist, artist_id)):
+    summary, key, show_key = SUMMARIES[model]
+    if start_time < now:
+      # the next roll counts every show from next_show_time on, which can
+      # include this one; counting it as past here would count it twice
+      refresh(model, [entity_id], now)
+      continue
+    values = {
+      'upcoming_count': summary.upcoming_count + 1,
+      'next_show_time': case(
+        (or_(summary.next_show_time.is_(None), summary.next_show_time > start_time), start_time),
+        else_=summary.next_show_time)
+    }
+    result = db.session.execute(update(summary.__table__).where(key == entity_id).values(values))
+    if result.rowcount == 0:
+      # first show of this entity
+      refresh(model, [entity_id], now)
+
+def roll(now=None):
+  """Move started shows from upcoming to past; return the ids rolled per model."""
+  now = now or datetime.now()
+  rolled = {}
+  for model, (summary, key, show_key) in SUMMARIES.items():
+    # every upcoming show starts at or after next_show_time, so the shows
+    # that started since the last roll are the ones in [next_show_time, now)
+    rows = db.session.execute(
+      select(
+        key,
+        func.count(Show.id).filter(Show.start_time < now),
+        func.min(Show.start_time).filter(Show.start_time >= now))
+      .select_from(summary)
+      .outerjoin(Show, (show_key == key) & (Show.start_time >= summary.next_show_time))
+      .where(summary.next_show_time <= now)
+      .group_by(key)).all()
+    if rows:
+      db.session.execute(
+        update(summary.__table__)
+          .where(key == bindparam('entity_id'))
+          .values(
+            upcoming_count=summary.upcoming_count - bindparam('moved'),
+            past_count=summary.past_count + bindparam('moved'),
+            next_show_time=bindparam('next_time')),
+        [{'entity_id': entity_id, 'moved': moved, 'next_time': next_time} for entity_id, moved, next_time in rows])
+    rolled[model] = [row[0] for row in rows]
+  return rolled
+
+def show_counts(model, entity_id):
+  """Return (upcoming_count, past_count) for a venue or artist."""
+  summary, key, show_key = SUMMARIES[model]
+  row = db.session.query(summary.upcoming_count, summary.past_count).filter(key == entity_id).first()
+  return tuple(row) if row else (0, 0)
+
+#----------------------------------------------------------------------------#
+# Genre facets.
+#----------------------------------------------------------------------------#
+
+# entity -> (count column, upcoming count column)
+GENRE_COUNTS = {
+  Venue: ('venue_count', 'upcoming_venue_count'),
+  Artist: ('artist_count', 'upcoming_artist_count'),
+}
+
+def _genre_rows(model):
+  # one (id, genre) row per genre an entity lists
+  if db.engine.dialect.name == 'postgresql':
+    return select(model.id.label('id'), func.unnest(model.genres).label('genre')).subquery()
+  values = func.json_each(model.genres).table_valued('value')
+  return select(model.id.label('id'), values.c.value.label('genre')) \
+    .select_from(model).join(values, true()).subquery()
+
+def refresh_genres():
+  """Recompute the genre facets; return whether any count changed."""
+  facets = {}
+  for model, (count, upcoming_count) in GENRE_COUNTS.items():
+    summary, key, show_key = SUMMARIES[model]
+    genres = _genre_rows(model)
+    rows = db.session.execute(
+      select(
+        genres.c.genre,
+        func.count(),
+        func.count(summary.upcoming_count).filter(summary.upcoming_count > 0),
+        func.coalesce(func.sum(summary.upcoming_count), 0))
+      .select_from(genres)
+      .outerjoin(summary, key == genres.c.id)
+      .group_by(genres.c.genre))
+    for genre, total, upcoming, upcoming_shows in rows:
+      facet = facets.setdefault(genre, dict.fromkeys(
+        ('venue_count', 'artist_count', 'upcoming_venue_count', 'upcoming_artist_count', 'upcoming_show_count'), 0))
+      facet[count] = total
+      facet[upcoming_count] = upcoming
+      if model is Artist:
+        facet['upcoming_show_count'] = upcoming_shows
+  columns = [column for column in GenreSummary.__table__.columns if column.name != 'updated_at']
+  previous = {row.genre: dict(row._mapping) for row in db.session.execute(select(*columns))}
+  if previous == {genre: dict(facet, genre=genre) for genre, facet in facets.items()}:
+    return False
+  db.session.execute(delete(GenreSummary.__table__))
+  if facets:
+    db.session.execute(insert(GenreSummary.__table__),
+      [dict(facet, genre=genre, updated_at=datetime.utcnow()) for genre, facet in facets.items()])
+  return True
+
+def genre_facets():
+  """Return every genre summary, by genre."""
+  return GenreSummary.query.order_by(GenreSummary.genre).all()
@@ -0,0 +1,5 @@
+"""Behavioural tests for Fyyur: `python -m pytest tests`.
+
+Each test gets an empty SQLite database of its own, so nothing here needs a
+PostgreSQL server.
+"""
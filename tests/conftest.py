@@ -0,0 +1,35 @@
+import pytest
+from app import create_app
+from extensions import db
+
+TOKEN = 'test-token'
+
+
+@pytest.fixture
+def app(tmp_path):
+  app = create_app({
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'fyyur.db'),
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'CACHE_TYPE': 'simple',
+    'API_WRITE_TOKEN': TOKEN,
+  })
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+
+@pytest.fixture
+def batch(client):
+  """POST rows to /api/v1/<entity>/batch; return (status, JSON body)."""
+  def post(entity, rows):
+    response = client.post('/api/v1/%s/batch' % entity, json=rows, headers={'Authorization': 'Bearer ' + TOKEN})
+    return response.status_code, response.get_json()
+  return post
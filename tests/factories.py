@@ -0,0 +1,29 @@
+from datetime import datetime
+from extensions import db
+from models.show import Show, DEFAULT_DURATION
+from models.venue import Venue
+from models.artist import Artist
+
+# rows added straight through the session, for the state a test starts from
+
+def add_venue(name='The Hall', city='San Francisco', state='CA', **values):
+  venue = Venue(name=name, city=city, state=state, address=values.pop('address', '1 Main St'),
+    genres=values.pop('genres', ['Jazz']), seeking_talent=False, **values)
+  db.session.add(venue)
+  db.session.commit()
+  return venue.id
+
+def add_artist(name='The Band', city='San Francisco', state='CA', **values):
+  artist = Artist(name=name, city=city, state=state, genres=values.pop('genres', ['Jazz']), seeking_venue=False, **values)
+  db.session.add(artist)
+  db.session.commit()
+  return artist.id
+
+def add_show(venue_id, artist_id, start_time, end_time=None):
+  show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time or start_time + DEFAULT_DURATION)
+  db.session.add(show)
+  db.session.commit()
+  return show.id
+
+def at(hour, day=1, minute=0):
+  return datetime(2030, 1, day, hour, minute)
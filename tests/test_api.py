@@ -0,0 +1,49 @@
+from tests.factories import add_artist, add_show, add_venue, at
+
+
+def _pages(client, path):
+  rows, cursor = [], ''
+  while True:
+    body = client.get(path + '&cursor=' + cursor).get_json()
+    rows.extend(body['data'])
+    if not body['next_cursor']:
+      return rows
+    cursor = body['next_cursor']
+
+
+def test_listing_pages_cover_every_row_once(client):
+  venue_ids = [add_venue('Hall %d' % number) for number in range(5)]
+  assert [row['id'] for row in _pages(client, '/api/v1/venues?limit=2')] == venue_ids
+
+
+def test_show_pages_cover_every_row_once_in_start_time_order(client):
+  venue_id, artist_id = add_venue(), add_artist()
+  # two shows start at the same time, so the cursor carries the id as well
+  show_ids = [add_show(venue_id, artist_id, at(hour, day=day)) for day, hour in ((3, 20), (1, 20), (2, 18), (2, 18), (1, 12))]
+  rows = _pages(client, '/api/v1/shows?limit=2&fields=id,start_time')
+  assert sorted(row['id'] for row in rows) == sorted(show_ids)
+  assert [row['start_time'] for row in rows] == sorted(row['start_time'] for row in rows)
+
+
+def test_fields_select_the_returned_columns(client):
+  venue_id = add_venue()
+  body = client.get('/api/v1/venues/%d?fields=name,city' % venue_id).get_json()
+  assert body == {'name': 'The Hall', 'city': 'San Francisco'}
+  response = client.get('/api/v1/venues/%d?fields=password' % venue_id)
+  assert response.status_code == 400 and response.get_json()['error'] == 'Bad Request'
+
+
+def test_counts_alone_are_read_from_the_summaries(client, batch):
+  venue_id, artist_id = add_venue(), add_artist()
+  batch('shows', [{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01T20:00:00'}])
+  # a show the summaries have not seen yet
+  add_show(venue_id, artist_id, at(20, day=2))
+  path = '/api/v1/venues/%d?fields=' % venue_id
+  assert client.get(path + 'upcoming_shows_count').get_json() == {'upcoming_shows_count': 1}
+  body = client.get(path + 'upcoming_shows,upcoming_shows_count').get_json()
+  assert body['upcoming_shows_count'] == 2 and len(body['upcoming_shows']) == 2
+
+
+def test_unknown_ids_are_json_404s(client):
+  response = client.get('/api/v1/artists/99')
+  assert response.status_code == 404 and response.get_json()['error'] == 'Not Found'
@@ -0,0 +1,110 @@
+from datetime import datetime
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from tests.factories import add_artist, add_show, add_venue, at
+
+
+def _venue(**values):
+  return dict({'name': 'The Hall', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+               'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/thehall'}, **values)
+
+
+def _row_errors(body):
+  return {row['index']: row['errors'] for row in body['rows']}
+
+
+def test_requires_the_write_token(client):
+  response = client.post('/api/v1/venues/batch', json=[_venue()])
+  assert response.status_code == 401
+
+
+def test_resending_a_batch_changes_nothing(batch):
+  rows = [_venue(id=10, name='Ten'), _venue(id=11, name='Eleven')]
+  assert batch('venues', rows) == (200, {'data': [{'id': 10}, {'id': 11}]})
+  assert batch('venues', rows) == (200, {'data': [{'id': 10}, {'id': 11}]})
+  db.session.expire_all()
+  assert sorted((venue.id, venue.name) for venue in Venue.query) == [(10, 'Ten'), (11, 'Eleven')]
+
+
+def test_resending_a_show_batch_does_not_conflict_with_itself(app, batch):
+  venue_id, artist_id = add_venue(), add_artist()
+  rows = [{'id': 5, 'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01T20:00:00'}]
+  assert batch('shows', rows) == (200, {'data': [{'id': 5}]})
+  assert batch('shows', rows) == (200, {'data': [{'id': 5}]})
+  assert [(show.id, show.start_time) for show in Show.query] == [(5, at(20))]
+
+
+def test_rows_with_an_id_replace_that_row(batch):
+  batch('venues', [_venue(id=10, name='Ten')])
+  status, body = batch('venues', [_venue(id=10, name='Renamed'), _venue(name='New')])
+  assert status == 200 and body['data'][0] == {'id': 10}
+  db.session.expire_all()
+  assert sorted(venue.name for venue in Venue.query) == ['New', 'Renamed']
+
+
+def test_rejects_a_double_booking_within_the_batch(app, batch):
+  venue_id, artist_id, other_artist_id = add_venue(), add_artist(), add_artist('Other Band')
+  status, body = batch('shows', [
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01T20:00:00'},
+    {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': '2030-01-01T21:00:00'},
+  ])
+  assert status == 400
+  assert _row_errors(body) == {1: ['venue already booked by another show of the batch']}
+  # the batch is applied whole or not at all
+  assert Show.query.count() == 0
+
+
+def test_rejects_a_double_booking_against_stored_shows(app, batch):
+  venue_id, artist_id, other_venue_id = add_venue(), add_artist(), add_venue('Other Hall')
+  stored_id = add_show(venue_id, artist_id, at(20))
+  status, body = batch('shows', [
+    {'venue_id': other_venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01T21:30:00'},
+  ])
+  assert status == 400
+  assert _row_errors(body) == {0: ['artist already booked by show %d' % stored_id]}
+
+
+def test_times_with_an_offset_are_stored_as_utc(app, batch):
+  venue_id, artist_id = add_venue(), add_artist()
+  status, body = batch('shows', [{'venue_id': venue_id, 'artist_id': artist_id,
+    'start_time': '2030-01-01T20:00:00+05:00', 'end_time': '2030-01-01T22:30:00+05:00'}])
+  assert status == 200
+  show = db.session.get(Show, body['data'][0]['id'])
+  assert (show.start_time, show.end_time) == (datetime(2030, 1, 1, 15), datetime(2030, 1, 1, 17, 30))
+
+
+def test_offset_times_are_checked_against_stored_shows(app, batch):
+  venue_id, artist_id = add_venue(), add_artist()
+  stored_id = add_show(venue_id, artist_id, at(15))
+  status, body = batch('shows', [{'venue_id': venue_id, 'artist_id': add_artist('Other Band'),
+    'start_time': '2030-01-01T21:00:00+05:00'}])
+  assert status == 400
+  assert _row_errors(body) == {0: ['venue already booked by show %d' % stored_id]}
+
+
+def test_invalid_values_are_row_errors(app, batch):
+  venue_id, artist_id = add_venue(), add_artist()
+  status, body = batch('shows', [
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': 'tomorrow'},
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': 1893528000},
+    {'venue_id': 1.5, 'artist_id': artist_id, 'start_time': '2030-01-01T20:00:00'},
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01T20:00:00', 'end_time': '2030-01-01T19:00:00'},
+  ])
+  assert status == 400
+  errors = _row_errors(body)
+  assert errors[0] == ["start_time: not an ISO 8601 date and time: 'tomorrow'"]
+  assert errors[1] == ['start_time: not an ISO 8601 date and time: 1893528000']
+  assert errors[2] == ['venue_id: must be an integer']
+  assert errors[3][0].startswith('end_time: must be after start_time')
+
+
+def test_out_of_range_ids_are_row_errors(batch):
+  status, body = batch('venues', [_venue(id=10 ** 20), _venue(id=0), _venue(id=True), _venue(id=7.0)])
+  assert status == 400
+  assert _row_errors(body) == {
+    0: ['id: must be between 1 and 2147483647'],
+    1: ['id: must be between 1 and 2147483647'],
+    2: ['id: must be an integer'],
+  }
+  assert Venue.query.count() == 0
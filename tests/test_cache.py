@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from extensions import cache
+from tests.factories import add_artist, add_venue
+import commands
+
+
+def _edit_venue(client, venue_id, name):
+  response = client.post('/venues/%d/edit' % venue_id, data={
+    'name': name, 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+    'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/thehall'})
+  assert response.status_code == 302
+  # the redirected page carries the flash message and is never cached
+  client.get(response.headers['Location'])
+
+
+def test_cached_pages_are_hits_until_their_group_is_invalidated(client):
+  venue_id = add_venue()
+  assert client.get('/venues/%d' % venue_id).headers['X-Cache'] == 'MISS'
+  assert client.get('/venues/%d' % venue_id).headers['X-Cache'] == 'HIT'
+  cache.invalidate('venue:%d' % venue_id)
+  assert client.get('/venues/%d' % venue_id).headers['X-Cache'] == 'MISS'
+
+
+def test_an_edit_is_not_hidden_by_the_cached_page(client):
+  venue_id = add_venue('The Hall')
+  assert b'The Hall' in client.get('/venues/%d' % venue_id).data
+  assert b'The Hall' in client.get('/venues').data
+  _edit_venue(client, venue_id, 'The Renamed Hall')
+  for path in ('/venues/%d' % venue_id, '/venues'):
+    response = client.get(path)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert b'The Renamed Hall' in response.data
+
+
+def test_a_change_made_elsewhere_is_not_served_from_the_cache(app, client):
+  # another process changed the venue without invalidating this one's cache
+  venue_id = add_venue('The Hall')
+  first = client.get('/venues/%d' % venue_id)
+  with sa.create_engine(app.config['SQLALCHEMY_DATABASE_URI']).begin() as connection:
+    connection.execute(sa.text('UPDATE venue SET name = :name, updated_at = :now WHERE id = :id'),
+      {'name': 'The Renamed Hall', 'now': datetime.utcnow() + timedelta(seconds=1), 'id': venue_id})
+  second = client.get('/venues/%d' % venue_id)
+  assert second.headers['ETag'] != first.headers['ETag']
+  assert second.headers['X-Cache'] == 'MISS'
+  assert b'The Renamed Hall' in second.data
+
+
+def test_if_none_match_is_answered_with_304_until_an_edit(client):
+  venue_id = add_venue('The Hall')
+  path = '/venues/%d' % venue_id
+  etag = client.get(path).headers['ETag']
+  response = client.get(path, headers={'If-None-Match': etag})
+  assert response.status_code == 304 and response.data == b''
+  _edit_venue(client, venue_id, 'The Renamed Hall')
+  response = client.get(path, headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.headers['ETag'] != etag
+  assert b'The Renamed Hall' in response.data
+  assert client.get(path, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_a_new_show_changes_the_listing_etags(client):
+  venue_id, artist_id = add_venue(), add_artist()
+  etags = {path: client.get(path).headers['ETag'] for path in ('/api/v1/venues', '/api/v1/artists', '/api/v1/shows')}
+  response = client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2030-01-01 20:00:00'})
+  assert b'Show was successfully listed!' in response.data
+  for path, etag in etags.items():
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 200, path
+
+
+def test_commands_only_invalidate_a_shared_cache(app, monkeypatch):
+  monkeypatch.setattr(commands._invalidate, 'warned', False)
+  versions = cache.versions(['venues'])
+  result = app.test_cli_runner().invoke(args=['roll-summaries', '--rebuild'])
+  assert result.exit_code == 0
+  # a per-process cache cannot reach the web processes from a command
+  assert 'CACHE_TYPE=simple is per process' in result.output
+  assert cache.versions(['venues']) == versions
@@ -0,0 +1,44 @@
+from tests.factories import add_artist, add_show, add_venue, at
+
+
+def _lines(response):
+  assert response.data.endswith(b'\r\n')
+  return response.data[:-2].split(b'\r\n')
+
+
+def test_a_feed_has_one_event_per_show(client):
+  venue_id, artist_id = add_venue(), add_artist()
+  show_ids = [add_show(venue_id, artist_id, at(20, day=day)) for day in (2, 1)]
+  response = client.get('/venues/%d/calendar.ics' % venue_id)
+  assert response.status_code == 200 and response.mimetype == 'text/calendar'
+  lines = _lines(response)
+  assert lines[0] == b'BEGIN:VCALENDAR' and lines[-1] == b'END:VCALENDAR'
+  assert [line for line in lines if line.startswith(b'UID:')] == \
+    [b'UID:show-%d@localhost' % show_id for show_id in reversed(show_ids)]
+  assert b'DTSTART:20300101T200000Z' in lines and b'DTEND:20300101T220000Z' in lines
+
+
+def test_text_is_escaped_and_long_lines_are_folded(client):
+  venue_id = add_venue('Hall; Bar, Grill', address='%s Very Long Street Name' % ('1' * 80))
+  add_show(venue_id, add_artist('Band ü' * 20), at(20))
+  lines = _lines(client.get('/venues/%d/calendar.ics' % venue_id))
+  assert all(len(line) <= 75 for line in lines)
+  unfolded = b'\r\n'.join(lines).replace(b'\r\n ', b'').decode('utf-8').split('\r\n')
+  assert 'X-WR-CALNAME:Hall\\; Bar\\, Grill' in unfolded
+  summary = [line for line in unfolded if line.startswith('SUMMARY:')]
+  assert summary == ['SUMMARY:' + 'Band ü' * 20 + ' at Hall\\; Bar\\, Grill']
+
+
+def test_from_and_to_bound_the_feed(client):
+  artist_id, venue_id = add_artist(), add_venue()
+  show_ids = [add_show(venue_id, artist_id, at(20, day=day)) for day in (1, 2, 3)]
+  response = client.get('/artists/%d/calendar.ics?from=2030-01-02T00:00:00&to=2030-01-03T20:00:00' % artist_id)
+  assert [line for line in _lines(response) if line.startswith(b'UID:')] == [b'UID:show-%d@localhost' % show_ids[1]]
+  assert client.get('/artists/%d/calendar.ics?from=later' % artist_id).status_code == 400
+
+
+def test_an_unchanged_feed_is_answered_with_304(client):
+  venue_id = add_venue()
+  path = '/venues/%d/calendar.ics' % venue_id
+  etag = client.get(path).headers['ETag']
+  assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
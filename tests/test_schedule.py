@@ -0,0 +1,76 @@
+import random
+from datetime import timedelta
+import schedule
+from tests.factories import add_artist, add_show, add_venue, at
+
+
+def _show(venue_id, artist_id, start_time, hours=2):
+  return {'id': None, 'venue_id': venue_id, 'artist_id': artist_id,
+          'start_time': start_time, 'end_time': start_time + timedelta(hours=hours)}
+
+
+def test_interval_tree_matches_a_scan():
+  rnd = random.Random(7)
+  intervals = []
+  for value in range(300):
+    start = rnd.randint(0, 1000)
+    intervals.append((start, start + rnd.randint(1, 50), value))
+  tree = schedule.IntervalTree(intervals)
+  for _ in range(200):
+    start = rnd.randint(-20, 1020)
+    end = start + rnd.randint(1, 80)
+    expected = sorted(item for item in intervals if item[0] < end and item[1] > start)
+    assert sorted(tree.overlapping(start, end)) == expected
+
+
+def test_interval_tree_is_half_open():
+  tree = schedule.IntervalTree([(10, 20, 'a')])
+  assert tree.overlapping(20, 30) == []
+  assert tree.overlapping(0, 10) == []
+  assert tree.overlapping(19, 21) == [(10, 20, 'a')]
+
+
+def test_check_rejects_a_double_booking_within_the_batch(app):
+  venue_id, artist_id, other_artist_id = add_venue(), add_artist(), add_artist('Other Band')
+  shows = [
+    ('first', _show(venue_id, artist_id, at(20))),
+    ('second', _show(venue_id, other_artist_id, at(21))),
+    ('third', _show(venue_id, other_artist_id, at(22))),
+  ]
+  accepted, rejected = schedule.check(shows)
+  assert [key for key, show in accepted] == ['first', 'third']
+  assert rejected == [('second', ['venue already booked by another show of the batch'])]
+
+
+def test_check_rejects_a_double_booking_against_stored_shows(app):
+  venue_id, artist_id, other_venue_id = add_venue(), add_artist(), add_venue('Other Hall')
+  stored_id = add_show(venue_id, artist_id, at(20))
+  accepted, rejected = schedule.check([
+    ('venue', _show(venue_id, add_artist('Other Band'), at(21))),
+    ('artist', _show(other_venue_id, artist_id, at(19))),
+  ])
+  assert accepted == []
+  assert rejected == [
+    ('venue', ['venue already booked by show %d' % stored_id]),
+    ('artist', ['artist already booked by show %d' % stored_id]),
+  ]
+
+
+def test_check_accepts_back_to_back_shows_and_replaced_ones(app):
+  venue_id, artist_id = add_venue(), add_artist()
+  stored_id = add_show(venue_id, artist_id, at(20))
+  accepted, rejected = schedule.check([('next', _show(venue_id, artist_id, at(22)))])
+  assert rejected == [] and len(accepted) == 1
+  # a batch row replacing the stored show does not conflict with it
+  accepted, rejected = schedule.check([('moved', dict(_show(venue_id, artist_id, at(21)), id=stored_id))], replaced=[stored_id])
+  assert rejected == [] and len(accepted) == 1
+
+
+def test_conflicts_lists_each_pair_once(app):
+  venue_id, artist_id, other_artist_id = add_venue(), add_artist(), add_artist('Other Band')
+  first = add_show(venue_id, artist_id, at(20))
+  second = add_show(venue_id, other_artist_id, at(21))
+  add_show(venue_id, other_artist_id, at(20, day=2))
+  found = schedule.conflicts(at(0), at(0, day=3))
+  assert [(kind, entity_id, show['id'], other['id']) for kind, entity_id, show, other in found] == \
+    [('venue', venue_id, first, second)]
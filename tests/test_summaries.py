@@ -0,0 +1,54 @@
+from datetime import timedelta
+from extensions import db
+import summaries
+from models.venue import Venue
+from models.artist import Artist
+from tests.factories import add_artist, add_show, add_venue, at
+
+
+def _record(venue_id, artist_id, start_time, now):
+  add_show(venue_id, artist_id, start_time)
+  summaries.record_show(venue_id, artist_id, start_time, now)
+  db.session.commit()
+
+
+def test_record_show_counts_upcoming_shows(app):
+  venue_id, artist_id = add_venue(), add_artist()
+  _record(venue_id, artist_id, at(20, day=2), now=at(12))
+  _record(venue_id, artist_id, at(20), now=at(12))
+  assert summaries.show_counts(Venue, venue_id) == (2, 0)
+  assert summaries.show_counts(Artist, artist_id) == (2, 0)
+
+
+def test_a_show_recorded_in_the_past_is_not_counted_twice_by_the_roll(app):
+  venue_id, artist_id = add_venue(), add_artist()
+  _record(venue_id, artist_id, at(20), now=at(12))
+  # a show backfilled after the upcoming one has started, before the roll
+  _record(venue_id, artist_id, at(21), now=at(23))
+  summaries.roll(at(23))
+  db.session.commit()
+  assert summaries.show_counts(Venue, venue_id) == (0, 2)
+  assert summaries.show_counts(Artist, artist_id) == (0, 2)
+
+
+def test_roll_moves_started_shows_to_past(app):
+  venue_id, artist_id = add_venue(), add_artist()
+  for day in (1, 2, 3):
+    _record(venue_id, artist_id, at(20, day=day), now=at(12))
+  rolled = summaries.roll(at(20, day=2) + timedelta(minutes=1))
+  db.session.commit()
+  assert rolled[Venue] == [venue_id] and rolled[Artist] == [artist_id]
+  assert summaries.show_counts(Venue, venue_id) == (1, 2)
+  # nothing has started since
+  assert summaries.roll(at(21, day=2))[Venue] == []
+
+
+def test_roll_matches_a_rebuild(app):
+  venue_id, other_venue_id, artist_id = add_venue(), add_venue('Other Hall'), add_artist()
+  for day, hall in ((1, venue_id), (2, other_venue_id), (3, venue_id), (4, other_venue_id)):
+    _record(hall, artist_id, at(20, day=day), now=at(12))
+  now = at(22, day=3)
+  summaries.roll(now)
+  rolled = {entity_id: summaries.show_counts(Venue, entity_id) for entity_id in (venue_id, other_venue_id)}
+  summaries.rebuild(now)
+  assert rolled == {entity_id: summaries.show_counts(Venue, entity_id) for entity_id in (venue_id, other_venue_id)}
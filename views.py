@@ -0,0 +1,403 @@
+from flask import Blueprint, render_template, request, Response, flash, redirect, url_for, jsonify, stream_with_context, abort, current_app
+from forms import VenueForm, ArtistForm, ShowForm
+from extensions import db, cache, replicas
+from conditional import conditional
+from api import parse_filters, parse_range
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+import repository
+import calendars
+import search
+import exporter
+import summaries
+import filters
+import geocoding
+import importer
+import schedule
+import writes
+import sys
+import hmac
+
+main = Blueprint('main', __name__)
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+def stream_template(template_name, **context):
+  # render the template as a generator so the first bytes are sent before the
+  # whole page is built
+  current_app.update_template_context(context)
+  template = current_app.jinja_env.get_template(template_name)
+  stream = template.stream(context)
+  stream.enable_buffering(current_app.config['TEMPLATE_STREAM_BUFFER'])
+  return Response(stream_with_context(stream))
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+# Each write evicts the pages that render the changed row: its own page, the
+# listings that name it, and the pages of every counterpart it has shows with.
+# The template fragments rendered from the row itself are tagged
+# 'venue-row:<id>' or 'artist-row:<id>', so the other fragments of those
+# pages survive.
+
+def venue_cache_groups(venue_id):
+  return ['venues', 'shows', 'venue:%d' % venue_id, 'venue-row:%d' % venue_id] + \
+    ['artist:%d' % artist_id for artist_id in repository.venue_artist_ids(venue_id)]
+
+def artist_cache_groups(artist_id):
+  return ['artists', 'shows', 'artist:%d' % artist_id, 'artist-row:%d' % artist_id] + \
+    ['venue:%d' % venue_id for venue_id in repository.artist_venue_ids(artist_id)]
+
+def show_cache_groups(venue_id, artist_id):
+  return ['venues', 'artists', 'shows', 'venue:%d' % venue_id, 'artist:%d' % artist_id]
+
+#----------------------------------------------------------------------------#
+# Form data.
+#----------------------------------------------------------------------------#
+
+def venue_values(data):
+  return geocoding.locate({
+    'name': data['name'],
+    'city': data['city'],
+    'state': data['state'],
+    'address': data['address'],
+    'phone': data.get('phone'),
+    'genres': data.getlist('genres'),
+    'facebook_link': data.get('facebook_link'),
+    'image_link': data.get('image_link'),
+    'website': data.get('website_link'),
+    'seeking_talent': data.get('seeking_talent') == 'y',
+    'seeking_description': data.get('seeking_description')
+  })
+
+def artist_values(data):
+  return {
+    'name': data['name'],
+    'city': data['city'],
+    'state': data['state'],
+    'phone': data.get('phone', ''),
+    'genres': data.getlist('genres'),
+    'facebook_link': data.get('facebook_link', ''),
+    'image_link': data.get('image_link', ''),
+    'website': data.get('website_link', ''),
+    'seeking_venue': data.get('seeking_venue') == 'y',
+    'seeking_description': data.get('seeking_description', '')
+  }
+
+#----------------------------------------------------------------------------#
+# Listing filters.
+#----------------------------------------------------------------------------#
+
+FILTER_ARGS = ('genre', 'state', 'city', 'upcoming')
+
+@main.app_template_global()
+def listing_url(**changes):
+  """The current listing's URL with its filters, updated by `changes`; None drops one."""
+  args = {name: request.args[name] for name in FILTER_ARGS if request.args.get(name)}
+  args.update(changes)
+  return url_for(request.endpoint, **{name: value for name, value in args.items() if value is not None})
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@main.route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@main.route('/venues')
+@replicas.reads
+@conditional(repository.venues_freshness)
+@cache.cached(lambda: ['venues'])
+def venues():
+  page = request.args.get('page', 1, type=int)
+  filters = parse_filters(request.args)
+  data, has_next = repository.list_venue_areas(
+    page=max(page, 1),
+    per_page=current_app.config['AREAS_PER_PAGE'],
+    filters=repository.listing_filters(Venue, **filters))
+  return render_template('pages/venues.html', areas=data, page=page, has_next=has_next,
+    filters=filters, genres=summaries.genre_facets())
+
+@main.route('/venues/search', methods=['POST'])
+@replicas.reads
+def search_venues():
+  search_term = request.form.get('search_term', '')
+  response = search.search_venues(search_term,
+    limit=current_app.config['SEARCH_RESULTS_LIMIT'],
+    offset=request.form.get('offset', 0, type=int))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@main.route('/venues/<int:venue_id>')
+@replicas.reads
+@conditional(repository.venue_freshness)
+@cache.cached(lambda venue_id: ['venue:%d' % venue_id])
+def show_venue(venue_id):
+  data = repository.get_venue_detail(venue_id)
+  return render_template('pages/show_venue.html', venue=data)
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  try:
+    data = request.form
+    writes.create(Venue, venue_values(data))
+    db.session.commit()
+    cache.invalidate('venues')
+    flash('Venue ' + data['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occured. Venue ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+    
+  return render_template('pages/home.html')
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  form = VenueForm()
+  venue = Venue.query.get(venue_id)
+  form.name.data = venue.name
+  form.city.data = venue.city
+  form.state.data = venue.state
+  form.address.data = venue.address
+  form.phone.data = venue.phone
+  form.genres.data = venue.genres
+  form.facebook_link.data = venue.facebook_link
+  form.image_link.data = venue.image_link
+  form.website_link.data = venue.website
+  form.seeking_talent.data = 'y' if venue.seeking_talent else ''
+  form.seeking_description.data = venue.seeking_description
+
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  try:
+    data = request.form
+    if not writes.update_row(Venue, venue_id, venue_values(data)):
+      raise LookupError('No venue %d' % venue_id)
+    groups = venue_cache_groups(venue_id)
+    db.session.commit()
+    cache.invalidate(*groups)
+    flash('Venue ' + data['name'] + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occured. Venue ' + request.form['name'] + ' could not be updated.')
+  finally:
+    db.session.close()
+
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  try:
+    venue = Venue.query.get(venue_id)
+    artist_ids = repository.venue_artist_ids(venue.id)
+    groups = venue_cache_groups(venue.id)
+    db.session.delete(venue)
+    summaries.refresh(Venue, [venue.id])
+    summaries.refresh(Artist, artist_ids)
+    db.session.commit()
+    cache.invalidate(*groups)
+  except:
+    db.session.rollback()
+  finally:
+    db.session.close()
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  return jsonify({ 'success': True})
+
+#  Artists
+#  ----------------------------------------------------------------
+@main.route('/artists')
+@replicas.reads
+@conditional(repository.artists_freshness)
+@cache.cached(lambda: ['artists'])
+def artists():
+  filters = parse_filters(request.args)
+  artists = Artist.query.with_entities(Artist.id, Artist.name) \
+    .filter(*repository.listing_filters(Artist, **filters)) \
+    .all()
+  return render_template('pages/artists.html', artists=artists,
+    filters=filters, genres=summaries.genre_facets())
+
+@main.route('/artists/search', methods=['POST'])
+@replicas.reads
+def search_artists():
+  search_term = request.form.get('search_term', '')
+  response = search.search_artists(search_term,
+    limit=current_app.config['SEARCH_RESULTS_LIMIT'],
+    offset=request.form.get('offset', 0, type=int))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@main.route('/artists/<int:artist_id>')
+@replicas.reads
+@conditional(repository.artist_freshness)
+@cache.cached(lambda artist_id: ['artist:%d' % artist_id])
+def show_artist(artist_id):
+  data = repository.get_artist_detail(artist_id)
+  return render_template('pages/show_artist.html', artist=data)
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  try:
+    data = request.form
+    writes.create(Artist, artist_values(data))
+    db.session.commit()
+    cache.invalidate('artists')
+    flash('Artist ' + data['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occured. Artist ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+    
+  return render_template('pages/home.html')
+
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  form = ArtistForm()
+  artist = Artist.query.get(artist_id)
+  form.name.data = artist.name
+  form.city.data = artist.city
+  form.state.data = artist.state
+  form.phone.data = artist.phone
+  form.genres.data = artist.genres
+  form.facebook_link.data = artist.facebook_link
+  form.image_link.data = artist.image_link
+  form.website_link.data = artist.website
+  form.seeking_venue.data = 'y' if artist.seeking_venue else ''
+  form.seeking_description.data = artist.seeking_description
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  try:
+    data = request.form
+    if not writes.update_row(Artist, artist_id, artist_values(data)):
+      raise LookupError('No artist %d' % artist_id)
+    groups = artist_cache_groups(artist_id)
+    db.session.commit()
+    cache.invalidate(*groups)
+    flash('Artist ' + data['name'] + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occured. Artist ' + request.form['name'] + ' could not be updated.')
+  finally:
+    db.session.close()
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@main.route('/shows')
+@replicas.reads
+@conditional(repository.shows_freshness)
+@cache.cached(lambda: ['shows'])
+def shows():
+  filters = parse_filters(request.args)
+  data, next_cursor = repository.list_shows(
+    cursor=request.args.get('cursor'),
+    limit=current_app.config['SHOWS_PER_PAGE'],
+    filters=repository.show_filters(**filters))
+  return stream_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+    filters=filters, genres=summaries.genre_facets())
+
+@main.route('/shows/create')
+def create_shows():
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  try:
+    data = request.form
+    start_time = filters.parse_datetime(data['start_time'])
+    values = {
+      'artist_id': int(data['artist_id']),
+      'venue_id': int(data['venue_id']),
+      'start_time': start_time,
+      'end_time': importer.show_end_time(start_time, data.get('end_time') and filters.parse_datetime(data['end_time']))
+    }
+    conflicts = schedule.booked(**values)
+    if conflicts:
+      taken = 'venue' if conflicts[0].venue_id == values['venue_id'] else 'artist'
+      flash('Show could not be listed: the ' + taken + ' is already booked from ' +
+        conflicts[0].start_time.strftime('%Y-%m-%d %H:%M') + ' to ' + conflicts[0].end_time.strftime('%Y-%m-%d %H:%M') + '.')
+    else:
+      writes.create(Show, values)
+      summaries.record_show(values['venue_id'], values['artist_id'], values['start_time'])
+      db.session.commit()
+      cache.invalidate(*show_cache_groups(values['venue_id'], values['artist_id']))
+      flash('Show was successfully listed!')
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('An error occured. Show could not be listed.')
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
+
+#  Calendars
+#  ----------------------------------------------------------------
+
+def calendar_response(model, entity_id):
+  name = repository.get_entity(model, entity_id, ['name'])['name']
+  rows = calendars.shows(model, entity_id, **parse_range(request.args))
+  response = Response(stream_with_context(calendars.ics_chunks(name, rows, request.host)), mimetype=calendars.MIMETYPE)
+  response.headers['Content-Disposition'] = 'inline; filename=%s-%d.ics' % (model.__tablename__, entity_id)
+  return response
+
+@main.route('/venues/<int:venue_id>/calendar.ics')
+@replicas.reads
+@conditional(repository.venue_freshness)
+def venue_calendar(venue_id):
+  return calendar_response(Venue, venue_id)
+
+@main.route('/artists/<int:artist_id>/calendar.ics')
+@replicas.reads
+@conditional(repository.artist_freshness)
+def artist_calendar(artist_id):
+  return calendar_response(Artist, artist_id)
+
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/export/<entity>.<format>')
+@replicas.reads
+def export(entity, format):
+  token = current_app.config.get('EXPORT_TOKEN')
+  supplied = request.headers.get('Authorization', '')
+  if not token or not hmac.compare_digest(supplied, 'Bearer ' + token):
+    abort(401)
+  if entity not in exporter.ENTITIES or format not in exporter.FORMATS:
+    abort(404)
+  response = Response(stream_with_context(exporter.export(entity, format)), mimetype=exporter.FORMATS[format])
+  response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (entity, format)
+  return response
+
+@main.route('/cache/stats')
+def cache_stats():
+  return jsonify(cache.stats())
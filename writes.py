@@ -0,0 +1,172 @@
+from datetime import datetime
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models.show import Show
+from models.venue import Venue
+from models.artist import Artist
+import importer
+import schedule
+import summaries
+
+#----------------------------------------------------------------------------#
+# Write service.
+#
+# Each mutation is a single statement and nothing is read back after it:
+# an insert returns the new id (through RETURNING on PostgreSQL, the
+# cursor's lastrowid elsewhere) and an update reports through its row count
+# whether the row existed. upsert() applies a whole batch in one transaction
+# with set-based statements, keyed on id, so resending the same batch leaves
+# the same rows.
+#----------------------------------------------------------------------------#
+
+ENTITIES = {
+  'venues': (Venue, importer.prepare_venue),
+  'artists': (Artist, importer.prepare_artist),
+  'shows': (Show, importer.prepare_show),
+}
+
+# dialects whose insert() takes on_conflict_do_update
+UPSERT_INSERTS = {
+  'postgresql': postgresql.insert,
+  'sqlite': sqlite.insert,
+}
+
+def create(model, values):
+  """Insert one row and return its id."""
+  result = db.session.execute(insert(model.__table__).values(values))
+  return result.inserted_primary_key[0]
+
+def update_row(model, entity_id, values):
+  """Update one row; return False when it does not exist."""
+  table = model.__table__
+  result = db.session.execute(update(table).where(table.c.id == entity_id).values(values))
+  return result.rowcount == 1
+
+#----------------------------------------------------------------------------#
+# Batch upsert.
+#----------------------------------------------------------------------------#
+
+class BatchError(Exception):
+  def __init__(self, errors):
+    super(BatchError, self).__init__('%d invalid rows' % len(errors))
+    self.errors = errors
+
+
+def prepare(entity, rows):
+  """Validate a batch; return the prepared rows or raise BatchError with (index, errors) pairs."""
+  model, prepare_row = ENTITIES[entity]
+  prepared, errors = [], []
+  seen = set()
+  for index, row in enumerate(rows):
+    try:
+      values, row_errors = prepare_row(row) if isinstance(row, dict) else (None, ['not an object'])
+    except (TypeError, ValueError) as e:
+      values, row_errors = None, [str(e)]
+    if values is not None and values['id'] is not None:
+      # one statement cannot write the same row twice
+      if values['id'] in seen:
+        row_errors = ['id: appears more than once in the batch']
+      seen.add(values['id'])
+    if row_errors:
+      errors.append((index, row_errors))
+    else:
+      prepared.append((index, values))
+  if entity == 'shows' and not errors:
+    prepared, errors = importer.resolve_shows(prepared)
+  if entity == 'shows' and not errors:
+    # shows the batch replaces do not conflict with their new versions
+    prepared, errors = schedule.check(prepared, replaced=seen)
+  if errors:
+    raise BatchError(sorted(errors))
+  return [values for index, values in prepared]
+
+def _insert_new(table, rows):
+  # rows without an id take one from the sequence; RETURNING gives them back
+  # in order, and without it every row needs its own INSERT for its id
+  if not rows:
+    return []
+  if db.engine.dialect.full_returning:
+    return list(db.session.execute(insert(table).values(rows).returning(table.c.id)).scalars())
+  return [db.session.execute(insert(table).values(row)).inserted_primary_key[0] for row in rows]
+
+def _upsert_existing(table, rows):
+  if not rows:
+    return
+  statement = UPSERT_INSERTS[db.engine.dialect.name](table).values(rows)
+  statement = statement.on_conflict_do_update(
+    index_elements=[table.c.id],
+    set_={name: statement.excluded[name] for name in rows[0] if name != 'id'})
+  db.session.execute(statement)
+
+def _replace_shows(rows):
+  # on PostgreSQL show is partitioned on start_time and id alone has no
+  # unique index to resolve a conflict on, so the shows of the batch that
+  # exist are deleted and inserted again; a changed start_time moves the
+  # row to its new partition
+  table = Show.__table__
+  ids = [row['id'] for row in rows]
+  previous = db.session.execute(
+    select(table.c.venue_id, table.c.artist_id).where(table.c.id.in_(ids))).all()
+  db.session.execute(delete(table).where(table.c.id.in_(ids)))
+  db.session.execute(insert(table), rows)
+  return previous
+
+def upsert(entity, rows):
+  """Insert or update a batch of prepared rows in one transaction.
+
+  Rows with an id replace the row with that id, or are inserted with it;
+  rows without one are inserted. Returns (ids in the order given, the cache
+  groups to invalidate).
+  """
+  model = ENTITIES[entity][0]
+  table = model.__table__
+  now = datetime.utcnow()
+  rows = [dict(row, updated_at=now) for row in rows]
+  with_ids = [row for row in rows if row['id'] is not None]
+  without_ids = [{key: value for key, value in row.items() if key != 'id'} for row in rows if row['id'] is None]
+  try:
+    if entity == 'shows':
+      previous = _replace_shows(with_ids) if with_ids else []
+    else:
+      _upsert_existing(table, with_ids)
+    new_ids = iter(_insert_new(table, without_ids))
+    ids = [row['id'] if row['id'] is not None else next(new_ids) for row in rows]
+    if entity == 'shows':
+      venue_ids = {row['venue_id'] for row in rows} | {row.venue_id for row in previous}
+      artist_ids = {row['artist_id'] for row in rows} | {row.artist_id for row in previous}
+      summaries.refresh(Venue, venue_ids)
+      summaries.refresh(Artist, artist_ids)
+      groups = _show_groups(venue_ids, artist_ids)
+    else:
+      groups = _entity_groups(model, ids)
+    db.session.commit()
+  except Exception:
+    db.session.rollback()
+    raise
+  if with_ids:
+    importer.sync_sequence(model)
+  return ids, groups
+
+#----------------------------------------------------------------------------#
+# Cache groups.
+#
+# The batch counterparts of views.venue_cache_groups and friends, with one
+# query for the whole batch.
+#----------------------------------------------------------------------------#
+
+def _entity_groups(model, ids):
+  prefix, key, counterpart_prefix, counterpart_key = {
+    Venue: ('venue', Show.venue_id, 'artist', Show.artist_id),
+    Artist: ('artist', Show.artist_id, 'venue', Show.venue_id),
+  }[model]
+  counterpart_ids = db.session.execute(select(counterpart_key).where(key.in_(ids)).distinct()).scalars()
+  groups = {prefix + 's', 'shows'}
+  groups.update('%s:%d' % (prefix, entity_id) for entity_id in ids)
+  groups.update('%s-row:%d' % (prefix, entity_id) for entity_id in ids)
+  groups.update('%s:%d' % (counterpart_prefix, counterpart_id) for counterpart_id in counterpart_ids)
+  return groups
+
+def _show_groups(venue_ids, artist_ids):
+  return {'venues', 'artists', 'shows'} | {'venue:%d' % venue_id for venue_id in venue_ids} | \
+    {'artist:%d' % artist_id for artist_id in artist_ids}
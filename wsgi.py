@@ -0,0 +1,8 @@
+import os
+
+# production entry point: `gunicorn wsgi:app` (settings in gunicorn.conf.py)
+os.environ.setdefault('FYYUR_DEBUG', '0')
+
+from app import create_app
+
+app = create_app()